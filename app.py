@@ -5,7 +5,8 @@ from utils.db_manager import VectorDBManager
 from services.response_generator import ResponseGenerator
 from services.suggestion_engine import SuggestionEngine
 from utils.chat_history import ChatHistory
-from utils.embedder import get_embedder
+from utils.embedder import get_embedder, warm_up
+import threading
 import time
 
 # Load environment variables
@@ -42,6 +43,16 @@ st.set_page_config(
     }
 )
 
+@st.cache_resource(show_spinner=False)
+def _start_embedder_warm_up():
+    """Start loading the embedding model in the background, once per process."""
+    thread = threading.Thread(target=warm_up, name="embedder-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+# Model loading overlaps with page setup; get_embedder() below waits for it
+_start_embedder_warm_up()
+
 # Initialize session state
 if 'initialized' not in st.session_state:
     st.session_state.initialized = True
@@ -499,23 +510,17 @@ def _index_documents(db_manager):
         progress_bar = st.progress(0)
         status_text = st.empty()
         
+        # Each PDF is split, embedded and upserted as one streaming pipeline
         if os.path.exists(patent_pdf):
-            status_text.text("📄 Loading Patent FAQ document...")
+            status_text.text("🔄 Loading and indexing Patent FAQ document...")
             progress_bar.progress(25)
-            patent_docs = db_manager.load_pdf(patent_pdf)
-            
-            status_text.text("🔄 Indexing Patent FAQ embeddings...")
-            progress_bar.progress(50)
-            db_manager.index_document("patent_faqs", patent_docs, {"source": patent_pdf})
+            db_manager.index_pdf("patent_faqs", patent_pdf, {"source": patent_pdf})
         
         if os.path.exists(bis_pdf):
-            status_text.text("📄 Loading BIS FAQ document...")
+            status_text.text("🔄 Loading and indexing BIS FAQ document...")
             progress_bar.progress(75)
-            bis_docs = db_manager.load_pdf(bis_pdf)
-            
-            status_text.text("🔄 Indexing BIS FAQ embeddings...")
+            db_manager.index_pdf("bis_faqs", bis_pdf, {"source": bis_pdf})
             progress_bar.progress(100)
-            db_manager.index_document("bis_faqs", bis_docs, {"source": bis_pdf})
         
         status_text.success("✅ Documents indexed successfully!")
         time.sleep(2)
@@ -613,8 +618,8 @@ with st.sidebar:
     # Settings
     with st.expander("⚙️ Settings"):
         st.markdown("**Response Settings**")
-        temperature = st.slider("Creativity", 0.0, 1.0, 0.7, 0.1)
-        max_tokens = st.slider("Response Length", 100, 1000, 500, 50)
+        temperature = st.slider("Creativity", 0.0, 1.0, 0.2, 0.1)
+        max_tokens = st.slider("Response Length", 100, 1000, 300, 50)
         
         if st.button("Apply Settings"):
             st.session_state.response_generator.update_config(
@@ -735,20 +740,23 @@ if current_question:
     st.session_state.show_welcome = False
     st.session_state.chat_history.add_message("user", current_question)
     
-    # Show typing indicator
-    with st.spinner("🤔 Thinking..."):
-        try:
-            response = st.session_state.response_generator.generate_response(current_question)
-            
-            if response and response["answer"]:
-                st.session_state.chat_history.add_message("assistant", response["answer"], response["source"])
-            else:
-                no_answer_msg = "I apologize, but I don't have specific information about that topic. Please try asking about patents or BIS standards."
-                st.session_state.chat_history.add_message("assistant", no_answer_msg)
+    try:
+        # Show typing indicator while context is retrieved
+        with st.spinner("🤔 Thinking..."):
+            token_stream, source = st.session_state.response_generator.stream_response(current_question)
+        
+        # Render tokens as they arrive
+        answer = st.write_stream(token_stream)
         
-        except Exception as e:
-            error_msg = f"I encountered an error while processing your request: {str(e)}"
-            st.session_state.chat_history.add_message("assistant", error_msg)
+        if answer and answer.strip():
+            st.session_state.chat_history.add_message("assistant", answer.strip(), source)
+        else:
+            no_answer_msg = "I apologize, but I don't have specific information about that topic. Please try asking about patents or BIS standards."
+            st.session_state.chat_history.add_message("assistant", no_answer_msg)
+    
+    except Exception as e:
+        error_msg = f"I encountered an error while processing your request: {str(e)}"
+        st.session_state.chat_history.add_message("assistant", error_msg)
     
     st.session_state.selected_question = None
     st.rerun()
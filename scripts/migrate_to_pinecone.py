@@ -26,14 +26,19 @@ import pickle
 import sqlite3
 import json
 import argparse
-import time
-from typing import List, Dict, Any, Optional
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Iterable, Iterator
 from pathlib import Path
 
+import numpy as np
+
 # Add parent directory to path to import local modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.embedder import get_embedder
+from utils.embedder import get_embedder, contextual_text
 from dotenv import load_dotenv
 
 # Conditional import for VectorDBManager to allow dry-run testing
@@ -52,6 +57,11 @@ load_dotenv()
 class MigrationUtility:
     """Utility for migrating local vector stores to Pinecone."""
     
+    # Documents per embedding batch
+    EMBED_BATCH_SIZE = 50
+    # Maximum embedded batches waiting for upsert in the pipeline
+    PIPELINE_QUEUE_SIZE = 4
+    
     def __init__(self, source_dir: str = "vector_db", dry_run: bool = False):
         """
         Initialize migration utility.
@@ -73,8 +83,10 @@ class MigrationUtility:
             "documents_found": 0,
             "documents_migrated": 0,
             "errors": 0,
-            "skipped": 0
+            "skipped": 0,
+            "unchanged": 0
         }
+        self._stats_lock = threading.Lock()
     
     def analyze_local_store(self) -> Dict[str, Any]:
         """Analyze existing local vector store structure."""
@@ -134,63 +146,121 @@ class MigrationUtility:
         
         return analysis
     
-    def load_documents_from_pickle(self) -> List[Dict[str, Any]]:
-        """Load documents from pickle files."""
-        documents = []
+    def load_documents_from_pickle(self) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily yield documents from pickle files.
         
+        text.pkl and metadata.pkl are read as record streams (one pickle per
+        chunk, as written by convert_pickle_to_stream), so only the current
+        record is held in memory. Stores that pickled a whole list in one
+        go still load, but that list has to be unpickled in full first;
+        convert large stores once with --convert-pickles.
+        """
         # Try to load text.pkl which seems to contain document content
         text_pkl_path = self.source_dir / "text.pkl"
         metadata_pkl_path = self.source_dir / "metadata.pkl"
         
-        if text_pkl_path.exists():
-            try:
-                print(f"📖 Loading documents from {text_pkl_path}")
-                with open(text_pkl_path, 'rb') as f:
-                    text_data = pickle.load(f)
-                
-                # Load metadata if available
-                metadata_data = []
-                if metadata_pkl_path.exists():
-                    print(f"📝 Loading metadata from {metadata_pkl_path}")
-                    with open(metadata_pkl_path, 'rb') as f:
-                        metadata_data = pickle.load(f)
-                
-                # Combine text and metadata
-                if isinstance(text_data, list):
-                    for i, text in enumerate(text_data):
-                        doc = {
-                            "page_content": str(text) if text else "",
-                            "metadata": {
-                                "chunk_id": i,
-                                "source": f"local_store_document_{i}"
-                            }
-                        }
-                        
-                        # Add metadata if available
-                        if i < len(metadata_data) and isinstance(metadata_data[i], dict):
-                            doc["metadata"].update(metadata_data[i])
-                        
-                        if doc["page_content"].strip():  # Only add non-empty documents
-                            documents.append(doc)
+        if not text_pkl_path.exists():
+            return
+        
+        print(f"📖 Loading documents from {text_pkl_path}")
+        texts = self._iter_pickle_records(text_pkl_path)
+        metadata = iter(())
+        if metadata_pkl_path.exists():
+            print(f"📝 Loading metadata from {metadata_pkl_path}")
+            metadata = self._iter_pickle_records(metadata_pkl_path)
+        
+        # Combine text and metadata record by record
+        loaded = 0
+        try:
+            for i, text in enumerate(texts):
+                doc = {
+                    "page_content": str(text) if text else "",
+                    "metadata": {
+                        "chunk_id": i,
+                        "source": f"local_store_document_{i}"
+                    }
+                }
                 
-                print(f"✓ Loaded {len(documents)} documents from pickle files")
+                # Add metadata if available
+                record_metadata = next(metadata, None)
+                if isinstance(record_metadata, dict):
+                    doc["metadata"].update(record_metadata)
                 
-            except Exception as e:
-                print(f"❌ Error loading pickle files: {str(e)}")
+                if doc["page_content"].strip():  # Only yield non-empty documents
+                    loaded += 1
+                    yield doc
+        except Exception as e:
+            print(f"❌ Error loading pickle files: {str(e)}")
+            if loaded:
+                raise  # A partly read store must not look like a complete one
+            return
         
-        return documents
+        print(f"✓ Loaded {loaded} documents from pickle files")
     
-    def load_documents_from_chroma(self) -> List[Dict[str, Any]]:
-        """Load documents from ChromaDB SQLite file."""
-        documents = []
+    @staticmethod
+    def _iter_pickle_records(path: Path) -> Iterator[Any]:
+        """Yield the records of a pickle stream, or the items of a single pickled list."""
+        with open(path, 'rb') as f:
+            try:
+                first = pickle.load(f)
+            except EOFError:
+                return
+            
+            if not f.peek(1):
+                # One object in the file: the legacy whole-list format
+                if isinstance(first, list):
+                    yield from first
+                else:
+                    yield first
+                return
+            
+            yield first
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+    
+    @staticmethod
+    def convert_pickle_to_stream(path: Path) -> bool:
+        """
+        Rewrite a file holding one pickled list as a stream of per-record pickles.
+        
+        Reads the list once; afterwards the file can be migrated record by
+        record. Returns False if the file is already a stream.
+        """
+        with open(path, 'rb') as f:
+            try:
+                data = pickle.load(f)
+            except EOFError:
+                return False
+            if f.peek(1) or not isinstance(data, list):
+                return False
+        
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            for record in data:
+                pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return True
+    
+    def load_documents_from_chroma(self) -> Iterator[Dict[str, Any]]:
+        """Lazily yield documents from ChromaDB SQLite file."""
         chroma_path = self.source_dir / "chroma.sqlite3"
         
         if not chroma_path.exists():
-            return documents
+            return
         
         try:
             print(f"📊 Loading documents from ChromaDB: {chroma_path}")
             conn = sqlite3.connect(str(chroma_path))
+        except Exception as e:
+            print(f"❌ Error loading ChromaDB: {str(e)}")
+            return
+        
+        loaded = 0
+        try:
             cursor = conn.cursor()
             
             # Get table info
@@ -212,8 +282,8 @@ class MigrationUtility:
                                       for keyword in ['document', 'text', 'content', 'page_content'])]
                         
                         if text_columns:
-                            cursor.execute(f"SELECT * FROM {table_name} LIMIT 1000")
-                            rows = cursor.fetchall()
+                            # Iterate the cursor directly so rows are fetched on demand
+                            rows = conn.execute(f"SELECT * FROM {table_name} LIMIT 1000")
                             
                             for i, row in enumerate(rows):
                                 # Create document from row data
@@ -235,47 +305,44 @@ class MigrationUtility:
                                             doc["metadata"][col_name] = row[j]
                                 
                                 if doc["page_content"].strip():
-                                    documents.append(doc)
+                                    loaded += 1
+                                    yield doc
                                     
                     except Exception as e:
                         print(f"⚠️ Error processing table {table_name}: {str(e)}")
             
-            conn.close()
-            print(f"✓ Loaded {len(documents)} documents from ChromaDB")
+            print(f"✓ Loaded {loaded} documents from ChromaDB")
             
         except Exception as e:
             print(f"❌ Error loading ChromaDB: {str(e)}")
-        
-        return documents
+        finally:
+            conn.close()
     
-    def load_all_documents(self) -> List[Dict[str, Any]]:
-        """Load documents from all available sources in local vector store."""
-        all_documents = []
-        
-        # Load from pickle files
-        pickle_docs = self.load_documents_from_pickle()
-        all_documents.extend(pickle_docs)
-        
-        # Load from ChromaDB
-        chroma_docs = self.load_documents_from_chroma()
-        all_documents.extend(chroma_docs)
+    def iter_all_documents(self) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily yield unique documents from all sources in the local vector store.
         
-        # Remove duplicates based on content
-        unique_documents = []
+        Duplicates are dropped on the fly; only a set of integer content
+        hashes is retained, never the documents themselves.
+        """
+        self.stats["documents_found"] = 0
         seen_content = set()
         
-        for doc in all_documents:
+        for doc in itertools.chain(self.load_documents_from_pickle(),
+                                   self.load_documents_from_chroma()):
             content_hash = hash(doc["page_content"][:100])  # Use first 100 chars as hash
-            if content_hash not in seen_content:
-                seen_content.add(content_hash)
-                unique_documents.append(doc)
-            else:
+            if content_hash in seen_content:
                 self.stats["skipped"] += 1
+                continue
+            seen_content.add(content_hash)
+            self.stats["documents_found"] += 1
+            yield doc
         
-        self.stats["documents_found"] = len(unique_documents)
-        print(f"📚 Found {len(unique_documents)} unique documents (skipped {self.stats['skipped']} duplicates)")
-        
-        return unique_documents
+        print(f"📚 Found {self.stats['documents_found']} unique documents (skipped {self.stats['skipped']} duplicates)")
+    
+    def load_all_documents(self) -> List[Dict[str, Any]]:
+        """Load documents from all available sources in local vector store."""
+        return list(self.iter_all_documents())
     
     def re_embed_documents(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Re-embed documents with the new embedder to ensure dimensionality match."""
@@ -286,42 +353,72 @@ class MigrationUtility:
         print(f"📐 Using embedder: {embedder_info['provider']} (dimension: {embedder_info['dimension']})")
         
         re_embedded_docs = []
-        batch_size = 50  # Process in batches to avoid memory issues
+        batch_size = self.EMBED_BATCH_SIZE  # Process in batches to avoid memory issues
+        total_batches = (len(documents) + batch_size - 1) // batch_size
         
         for i in range(0, len(documents), batch_size):
             batch = documents[i:i + batch_size]
-            batch_texts = [doc["page_content"] for doc in batch]
-            
-            try:
-                print(f"🔄 Processing batch {i//batch_size + 1}/{(len(documents) + batch_size - 1)//batch_size}")
-                
-                # Generate new embeddings
-                embeddings = self.embedder.generate(batch_texts)
-                
-                # Add embeddings to documents
-                for j, doc in enumerate(batch):
-                    if j < len(embeddings):
-                        enhanced_doc = doc.copy()
-                        enhanced_doc["embedding"] = embeddings[j]
-                        enhanced_doc["metadata"]["embedding_provider"] = embedder_info["provider"]
-                        enhanced_doc["metadata"]["embedding_dimension"] = len(embeddings[j])
-                        re_embedded_docs.append(enhanced_doc)
-                    else:
-                        print(f"⚠️ Missing embedding for document {i + j}")
-                        self.stats["errors"] += 1
-                
-                # Small delay between batches
-                time.sleep(0.1)
-                
-            except Exception as e:
-                print(f"❌ Error in batch {i//batch_size + 1}: {str(e)}")
-                self.stats["errors"] += batch_size
+            print(f"🔄 Processing batch {i//batch_size + 1}/{total_batches}")
+            re_embedded_docs.extend(self._embed_batch(batch, embedder_info, offset=i))
         
         print(f"✓ Successfully re-embedded {len(re_embedded_docs)} documents")
         return re_embedded_docs
     
-    def upsert_to_pinecone(self, documents: List[Dict[str, Any]], namespace: str = "migrated"):
-        """Upsert documents to Pinecone by document ID."""
+    def _embed_batch(self, batch: List[Dict[str, Any]], embedder_info: Dict[str, Any],
+                     offset: int = 0) -> List[Dict[str, Any]]:
+        """Embed a single batch of documents, recording failures in stats."""
+        # Embed the same contextual text VectorDBManager would, so migrated
+        # vectors match ones indexed directly
+        batch_texts = [contextual_text(doc) for doc in batch]
+        
+        try:
+            # Generate new embeddings
+            embeddings = self.embedder.generate(batch_texts)
+        except Exception as e:
+            print(f"❌ Error embedding documents {offset}-{offset + len(batch) - 1}: {str(e)}")
+            self._add_stat("errors", len(batch))
+            return []
+        
+        # Add embeddings to documents
+        embedded = []
+        for j, doc in enumerate(batch):
+            if j < len(embeddings):
+                enhanced_doc = doc.copy()
+                # Keep a contiguous float32 array; it is only turned into a
+                # Python list when the upsert batch is serialized
+                enhanced_doc["embedding"] = np.asarray(embeddings[j], dtype=np.float32)
+                enhanced_doc["metadata"]["embedding_provider"] = embedder_info["provider"]
+                enhanced_doc["metadata"]["embedding_dimension"] = len(embeddings[j])
+                embedded.append(enhanced_doc)
+            else:
+                print(f"⚠️ Missing embedding for document {offset + j}")
+                self._add_stat("errors", 1)
+        return embedded
+    
+    @staticmethod
+    def _iter_batches(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+        """Yield successive lists of up to batch_size items from an iterable."""
+        iterator = iter(items)
+        while True:
+            batch = list(itertools.islice(iterator, batch_size))
+            if not batch:
+                return
+            yield batch
+    
+    def _add_stat(self, key: str, amount: int):
+        """Increment a stats counter; safe to call from pipeline worker threads."""
+        with self._stats_lock:
+            self.stats[key] += amount
+    
+    def upsert_to_pinecone(self, documents: List[Dict[str, Any]], namespace: str = "migrated",
+                           skip_unchanged: bool = True):
+        """
+        Upsert documents to Pinecone by document ID.
+        
+        Pass skip_unchanged=False for documents already filtered with
+        VectorDBManager.changed_documents(), to avoid fetching their
+        hashes a second time.
+        """
         if self.dry_run:
             print(f"🔥 DRY RUN: Would upsert {len(documents)} documents to namespace '{namespace}'")
             return
@@ -339,22 +436,110 @@ class MigrationUtility:
                     "page_content": doc["page_content"],
                     "metadata": doc["metadata"].copy()
                 }
+                # Reuse the vector computed during re-embedding instead of embedding twice
+                if "embedding" in doc:
+                    formatted_doc["embedding"] = doc["embedding"]
                 # Remove embedding from metadata as it's handled separately
                 formatted_doc["metadata"].pop("embedding_provider", None)
                 formatted_doc["metadata"].pop("embedding_dimension", None)
                 formatted_docs.append(formatted_doc)
             
             # Use the existing upsert_embeddings method
-            self.vector_db.upsert_embeddings(namespace, formatted_docs)
+            self.vector_db.upsert_embeddings(namespace, formatted_docs, skip_unchanged=skip_unchanged)
             
-            self.stats["documents_migrated"] = len(formatted_docs)
+            self._add_stat("documents_migrated", len(formatted_docs))
             print(f"✅ Successfully migrated {len(formatted_docs)} documents to Pinecone")
             
         except Exception as e:
             print(f"❌ Error upserting to Pinecone: {str(e)}")
-            self.stats["errors"] += len(documents)
+            self._add_stat("errors", len(documents))
             raise
     
+    def embed_and_upsert(self, documents: Iterable[Dict[str, Any]], namespace: str = "migrated") -> int:
+        """
+        Re-embed and upsert documents as a two-stage producer-consumer pipeline.
+        
+        An embed worker pushes embedded batches onto a bounded queue while an
+        upsert worker drains it, so batch N is being upserted while batch N+1
+        is being embedded. Documents are pulled from the iterable one batch
+        at a time and the queue bound keeps at most PIPELINE_QUEUE_SIZE
+        batches in flight, so memory stays O(batch) rather than O(corpus).
+        
+        Chunks already in Pinecone with the same content and embedding
+        model are dropped before embedding and counted as unchanged.
+        
+        Returns:
+            Number of documents that were successfully embedded
+        
+        Raises:
+            The first exception from either stage (reading documents,
+            embedding or upserting), after both workers have stopped
+        """
+        embedder_info = self.embedder.get_provider_info()
+        print("🔄 Re-embedding and upserting documents...")
+        print(f"📐 Using embedder: {embedder_info['provider']} (dimension: {embedder_info['dimension']})")
+        
+        batch_queue: "queue.Queue[Optional[List[Dict[str, Any]]]]" = queue.Queue(
+            maxsize=self.PIPELINE_QUEUE_SIZE
+        )
+        embedded_count = [0]
+        # First failure from either stage; the other stage stops early
+        errors: List[BaseException] = []
+        failed = threading.Event()
+        batch_size = self.EMBED_BATCH_SIZE
+        
+        def fail(error: BaseException):
+            errors.append(error)
+            failed.set()
+        
+        def embed_worker():
+            try:
+                for batch_num, batch in enumerate(self._iter_batches(documents, batch_size)):
+                    if failed.is_set():
+                        break  # Upserting failed; embedding more would be wasted
+                    offset = batch_num * batch_size
+                    if not self.dry_run:
+                        changed = self.vector_db.changed_documents(namespace, batch)
+                        self._add_stat("unchanged", len(batch) - len(changed))
+                        batch = changed
+                        if not batch:
+                            continue
+                    print(f"🔄 Embedding batch {batch_num + 1}")
+                    embedded = self._embed_batch(batch, embedder_info, offset=offset)
+                    if embedded:
+                        embedded_count[0] += len(embedded)
+                        batch_queue.put(embedded)
+            except Exception as e:
+                fail(e)
+            finally:
+                batch_queue.put(None)  # Sentinel: no more batches
+        
+        def upsert_worker():
+            while True:
+                batch = batch_queue.get()
+                if batch is None:
+                    break
+                if failed.is_set():
+                    continue  # Keep draining so the producer never blocks
+                try:
+                    self.upsert_to_pinecone(batch, namespace, skip_unchanged=False)
+                except Exception as e:
+                    fail(e)
+        
+        workers = [
+            threading.Thread(target=embed_worker, name="migration-embed", daemon=True),
+            threading.Thread(target=upsert_worker, name="migration-upsert", daemon=True),
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        
+        if errors:
+            raise errors[0]
+        print(f"✓ Successfully re-embedded {embedded_count[0]} documents")
+        return embedded_count[0]
+    
     def verify_migration(self, namespace: str, sample_size: int = 5):
         """Verify migration by testing some queries."""
         if self.dry_run:
@@ -373,9 +558,17 @@ class MigrationUtility:
                 "document analysis"
             ]
             
-            for i, query in enumerate(test_queries[:sample_size]):
+            queries = test_queries[:sample_size]
+            
+            # Dispatch all queries at once; results are printed in query order
+            with ThreadPoolExecutor(max_workers=max(len(queries), 1)) as pool:
+                all_results = list(pool.map(
+                    lambda q: self.vector_db.query_embeddings(namespace, q, top_k=3),
+                    queries
+                ))
+            
+            for i, (query, results) in enumerate(zip(queries, all_results)):
                 print(f"🔍 Testing query {i+1}: '{query}'")
-                results = self.vector_db.query_embeddings(namespace, query, top_k=3)
                 
                 if results:
                     print(f"   ✓ Found {len(results)} results")
@@ -384,8 +577,6 @@ class MigrationUtility:
                         print(f"      {j+1}. Score: {result['score']:.3f} - {preview}...")
                 else:
                     print(f"   ⚠️ No results found")
-                
-                time.sleep(0.5)  # Small delay between queries
             
             print("✅ Migration verification completed")
             
@@ -400,17 +591,19 @@ class MigrationUtility:
         print(f"Documents found:     {self.stats['documents_found']}")
         print(f"Documents migrated:  {self.stats['documents_migrated']}")
         print(f"Documents skipped:   {self.stats['skipped']}")
+        print(f"Already up to date:  {self.stats['unchanged']}")
         print(f"Errors:              {self.stats['errors']}")
         
         if self.stats['documents_found'] > 0:
-            success_rate = (self.stats['documents_migrated'] / self.stats['documents_found']) * 100
+            success_rate = ((self.stats['documents_migrated'] + self.stats['unchanged'])
+                            / self.stats['documents_found']) * 100
             print(f"Success rate:        {success_rate:.1f}%")
         
         print("="*60)
         
         if self.dry_run:
             print("🔥 This was a DRY RUN - no actual migration performed")
-        elif self.stats['documents_migrated'] > 0:
+        elif self.stats['documents_migrated'] > 0 or self.stats['unchanged'] > 0:
             print("✅ Migration completed successfully!")
         else:
             print("❌ Migration failed or no documents found")
@@ -431,23 +624,19 @@ class MigrationUtility:
                 print("❌ No data found in local vector store")
                 return False
             
-            # Step 2: Load documents from local store
-            documents = self.load_all_documents()
+            # Step 2-4: Stream documents from the local store through the
+            # new embedder into Pinecone, one batch at a time
+            documents = self.iter_all_documents()
+            embedded_count = self.embed_and_upsert(documents, namespace)
             
-            if not documents:
+            if not self.stats["documents_found"]:
                 print("❌ No documents loaded from local store")
                 return False
             
-            # Step 3: Re-embed documents with new embedder
-            re_embedded_docs = self.re_embed_documents(documents)
-            
-            if not re_embedded_docs:
+            if not embedded_count and not self.stats["unchanged"]:
                 print("❌ Failed to re-embed documents")
                 return False
             
-            # Step 4: Upsert to Pinecone
-            self.upsert_to_pinecone(re_embedded_docs, namespace)
-            
             # Step 5: Verify migration
             if verify and not self.dry_run:
                 self.verify_migration(namespace)
@@ -479,6 +668,9 @@ Examples:
   
   # Migration without verification  
   python scripts/migrate_to_pinecone.py --source vector_db --no-verify
+  
+  # Rewrite list pickles as record streams so large stores load lazily
+  python scripts/migrate_to_pinecone.py --source vector_db --convert-pickles
         """
     )
     
@@ -506,6 +698,12 @@ Examples:
         help="Skip verification step after migration"
     )
     
+    parser.add_argument(
+        "--convert-pickles",
+        action="store_true",
+        help="Rewrite text.pkl and metadata.pkl as per-record pickle streams, then exit"
+    )
+    
     parser.add_argument(
         "--verbose",
         action="store_true",
@@ -514,6 +712,14 @@ Examples:
     
     args = parser.parse_args()
     
+    if args.convert_pickles:
+        for name in ("text.pkl", "metadata.pkl"):
+            path = Path(args.source) / name
+            if path.exists():
+                converted = MigrationUtility.convert_pickle_to_stream(path)
+                print(f"{'✓ Converted' if converted else '• Already a stream:'} {path}")
+        return 0
+    
     # Check required environment variables
     if not args.dry_run:
         required_vars = ["PINECONE_API_KEY", "PINECONE_ENV", "PINECONE_INDEX_NAME"]
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+import weakref
+
+
+def is_rate_limited(error):
+    """
+    Whether a Groq or Pinecone API error is an HTTP 429 Too Many Requests.
+
+    Only the status attribute is checked: matching "429" in the message
+    would also catch request IDs and token counts, and retry errors that
+    will never succeed.
+    """
+    status = getattr(error, 'status_code', None) or getattr(error, 'status', None)
+    return status == 429
+
+
+class AsyncLimiter:
+    """
+    Token-bucket limiter for requests and tokens per minute.
+
+    Both buckets refill continuously. acquire() waits until one request and
+    the estimated number of tokens are available. throttle() shrinks both
+    buckets after a 429 and recover() grows them back after successes, so
+    the effective rate settles just below the provider's real limit.
+    """
+
+    MIN_SCALE = 0.1
+
+    def __init__(self, max_requests_per_minute, max_tokens_per_minute=None):
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self._scale = 1.0
+        self._requests = float(max_requests_per_minute)
+        self._tokens = float(max_tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        # asyncio locks are bound to one event loop, so keep one per loop
+        self._locks = weakref.WeakKeyDictionary()
+        self._locks_guard = threading.Lock()
+
+    def _lock(self):
+        loop = asyncio.get_running_loop()
+        with self._locks_guard:
+            lock = self._locks.get(loop)
+            if lock is None:
+                lock = self._locks[loop] = asyncio.Lock()
+            return lock
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+
+        request_capacity = self.max_requests_per_minute * self._scale
+        self._requests = min(request_capacity, self._requests + elapsed * request_capacity / 60)
+        if self.max_tokens_per_minute:
+            token_capacity = self.max_tokens_per_minute * self._scale
+            self._tokens = min(token_capacity, self._tokens + elapsed * token_capacity / 60)
+
+    async def acquire(self, tokens=0):
+        """Wait for capacity for one request of roughly `tokens` tokens."""
+        async with self._lock():
+            while True:
+                self._refill()
+                # A request larger than the whole bucket only waits for a full bucket
+                needed = min(tokens, self.max_tokens_per_minute * self._scale) if self.max_tokens_per_minute else 0
+
+                if self._requests >= 1 and self._tokens >= needed:
+                    self._requests -= 1
+                    self._tokens -= needed
+                    return
+
+                wait = (1 - self._requests) * 60 / (self.max_requests_per_minute * self._scale)
+                if needed:
+                    wait = max(wait, (needed - self._tokens) * 60 / (self.max_tokens_per_minute * self._scale))
+                await asyncio.sleep(max(wait, 0.001))
+
+    def release_loop(self):
+        """Forget the running loop's lock; call before that loop closes."""
+        with self._locks_guard:
+            self._locks.pop(asyncio.get_running_loop(), None)
+
+    def throttle(self):
+        """Halve the bucket sizes after a rate-limit response."""
+        self._scale = max(self.MIN_SCALE, self._scale / 2)
+        self._refill()
+
+    def recover(self):
+        """Grow the bucket sizes back towards the configured limits."""
+        self._scale = min(1.0, self._scale * 1.1)
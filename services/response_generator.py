@@ -1,23 +1,251 @@
-from groq import Groq
+from groq import Groq, AsyncGroq
 from dotenv import load_dotenv
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
 import os
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType, SimpleNamespace
+import numpy as np
 import streamlit as st
+from .rate_limiter import AsyncLimiter, is_rate_limited
+from .semantic_cache import SemanticCache
+from utils.redis_cache import RedisCache, RESPONSE_TTL
 
 load_dotenv()
 
+# Answer the model gives when the context does not cover the question
+NO_INFO = "I don't have information about this"
+
+@functools.lru_cache(maxsize=8)
+def _shared_client(client_cls, api_key):
+    """
+    One Groq client, and so one HTTP connection pool, per client class and API key.
+    
+    Bounded so rotated API keys do not keep stale clients alive. Only for
+    the sync client; async clients are bound to a loop (see _loop_resource).
+    """
+    return client_cls(api_key=api_key)
+
+# OpenAI-compatible chat endpoint used by the aiohttp fast transport
+GROQ_CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
+# Connection limits for the aiohttp fast transport
+FAST_TRANSPORT_CONNECTIONS = 200
+# Retries for an async completion rejected with HTTP 429
+RATE_LIMIT_MAX_RETRIES = 5
+# Rough characters per token used for client-side token budgeting
+CHARS_PER_TOKEN = 4
+# Tokens held back for message framing and the question template
+PROMPT_OVERHEAD_TOKENS = 200
+# Answers kept in the in-process exact-match cache
+RESPONSE_CACHE_SIZE = 512
+
+# Shared worker threads for running the patent and BIS searches side by side
+_search_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="faq-search")
+
+# HTTP clients are bound to the event loop that created them, so each loop
+# gets its own; close_loop_resources() closes them before the loop ends
+_loop_resources = weakref.WeakKeyDictionary()
+_loop_resources_lock = threading.Lock()
+
+def _loop_resource(key, factory):
+    """Return the running loop's resource for key, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    with _loop_resources_lock:
+        resources = _loop_resources.setdefault(loop, {})
+        if key not in resources:
+            resources[key] = factory()
+        return resources[key]
+
+async def close_loop_resources():
+    """Close the HTTP clients created for the running loop; call before the loop closes."""
+    with _loop_resources_lock:
+        resources = _loop_resources.pop(asyncio.get_running_loop(), {})
+    for resource in resources.values():
+        try:
+            closed = resource.close()
+            if inspect.isawaitable(closed):
+                await closed
+        except Exception as e:
+            print(f"Error closing async client: {str(e)}")
+
+def _get_aiohttp_session():
+    """Return the running loop's aiohttp session."""
+    import aiohttp
+    
+    def create():
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=FAST_TRANSPORT_CONNECTIONS,
+                limit_per_host=FAST_TRANSPORT_CONNECTIONS
+            ),
+            timeout=aiohttp.ClientTimeout(total=60)
+        )
+    return _loop_resource("aiohttp", create)
+
 class ResponseGenerator:
-    def __init__(self, db_manager, temperature=0.7, max_tokens=500, model="deepseek-r1-distill-llama-70b"):
+    SYSTEM_PROMPT = "You are a helpful assistant that provides information about patents and BIS standards. Use the provided context to answer questions accurately."
+    ERROR_MESSAGE = "I apologize, but I encountered an error while processing your request. Please try again."
+    PATENT_HEADER = "Patent Information:\n"
+    BIS_HEADER = "BIS Information:\n"
+    # generate() asks for a structured answer so "no answer" is a field, not a phrase
+    JSON_ANSWER_INSTRUCTIONS = (
+        ' Reply with a JSON object of the form {"has_answer": true, "answer": "..."}. '
+        'If the context does not answer the question, set has_answer to false and '
+        f'answer "{NO_INFO}."'
+    )
+    BATCH_ENDPOINT = "/v1/chat/completions"
+    BATCH_TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+    
+    def __init__(self, db_manager=None, temperature=0.2, max_tokens=300, model="llama-3.1-8b-instant", max_concurrency=8,
+                 cache_threshold=0.92, cache_ttl=3600, max_context_chars=12000, system_prompt=None,
+                 fast_transport=False, max_requests_per_minute=None, max_tokens_per_minute=None,
+                 context_window=8192):
+        # db_manager is only needed by the retrieval-backed methods; generate() takes its context directly
         self.db_manager = db_manager
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.model = model
+        self._refresh_config()
+        self.system_prompt = system_prompt or self.SYSTEM_PROMPT
+        # Prompt tokens the model accepts; the static system prompt is counted once here
+        self.context_window = context_window
+        self._system_tokens = self._estimate_tokens(self.system_prompt)
+        # System messages are identical on every request, so build them once
+        self._system_message = {"role": "system", "content": self.system_prompt}
+        self._json_system_message = {"role": "system", "content": self.system_prompt + self.JSON_ANSWER_INSTRUCTIONS}
+        # Upper bound on in-flight async completion requests
+        self.max_concurrency = max_concurrency
+        # Send async completions over aiohttp instead of the SDK's httpx client
+        self.fast_transport = fast_transport
+        # Paces async completions to the account's RPM/TPM limits when configured
+        self.rate_limiter = (
+            AsyncLimiter(max_requests_per_minute, max_tokens_per_minute)
+            if max_requests_per_minute else None
+        )
+        # Hard budget on retrieved context (~3000 tokens at ~4 chars per token)
+        self.max_context_chars = max_context_chars
+        # Answers for semantically equivalent queries are served from here
+        self.response_cache = SemanticCache(threshold=cache_threshold, ttl=cache_ttl)
+        # Identical repeated questions are answered from here without embedding the query
+        self.cache_ttl = cache_ttl
+        self._exact_cache = OrderedDict()
+        self._exact_cache_lock = threading.Lock()
+        # Exact-match answers shared across replicas; disabled without REDIS_URL
+        self.l2_cache = RedisCache()
         
         # Try Streamlit secrets first, then environment variables
         api_key = st.secrets.get("GROQ_API_KEY", os.getenv('GROQ_API_KEY'))
         if not api_key:
             raise ValueError("GROQ_API_KEY not found in environment variables or Streamlit secrets")
         
-        self.client = Groq(api_key=api_key)
+        self._api_key = api_key
+        self.client = _shared_client(Groq, api_key)
+        # One concurrency limit per event loop; a semaphore cannot cross loops
+        self._semaphores = weakref.WeakKeyDictionary()
+    
+    @property
+    def async_client(self):
+        """AsyncGroq client for the running event loop, used by agenerate_response."""
+        return _loop_resource(("groq", self._api_key), lambda: AsyncGroq(api_key=self._api_key))
+    
+    async def aclose(self):
+        """
+        Release what this generator holds for the running event loop.
+        
+        Call before closing a loop agenerate_response was used on. This
+        also closes the loop's HTTP clients, which other generators on the
+        same loop share; they are recreated on next use.
+        """
+        # Used semaphores and locks reference their loop, so drop them explicitly
+        self._semaphores.pop(asyncio.get_running_loop(), None)
+        if self.rate_limiter is not None:
+            self.rate_limiter.release_loop()
+        await close_loop_resources()
+    
+    async def _raw_chat(self, **request):
+        """
+        POST a chat completion straight to Groq over aiohttp.
+        
+        Bypasses the SDK's httpx client, which limits throughput at high
+        concurrency. The reply is shaped like an SDK completion for the
+        fields _format_response reads.
+        """
+        session = _get_aiohttp_session()
+        async with session.post(
+            GROQ_CHAT_URL,
+            json=request,
+            headers={"Authorization": f"Bearer {self._api_key}"}
+        ) as response:
+            response.raise_for_status()
+            payload = await response.json()
+        
+        return SimpleNamespace(choices=[
+            SimpleNamespace(message=SimpleNamespace(content=choice["message"]["content"]))
+            for choice in payload["choices"]
+        ])
+    
+    async def _achat(self, request):
+        """
+        Run an async chat completion within the concurrency and rate limits.
+        
+        HTTP 429 responses are retried with jittered exponential backoff
+        and shrink the rate limiter's buckets.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        
+        # Prompt estimate plus the completion budget
+        estimated_tokens = sum(
+            self._estimate_tokens(message["content"]) for message in request["messages"]
+        ) + request["max_tokens"]
+        
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(estimated_tokens)
+            try:
+                async with semaphore:
+                    if self.fast_transport:
+                        response = await self._raw_chat(**request)
+                    else:
+                        response = await self.async_client.chat.completions.create(**request)
+            except Exception as e:
+                if attempt == RATE_LIMIT_MAX_RETRIES or not is_rate_limited(e):
+                    raise
+                if self.rate_limiter is not None:
+                    self.rate_limiter.throttle()
+                delay = min(0.5 * 2 ** attempt, 30) * random.uniform(1, 1.5)
+                print(f"Groq rate limit hit, retrying in {delay:.1f}s...")
+                await asyncio.sleep(delay)
+            else:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.recover()
+                return response
+    
+    @staticmethod
+    def _estimate_tokens(text):
+        return -(-len(text) // CHARS_PER_TOKEN)
+    
+    def _context_budget(self, query, max_tokens):
+        """
+        Characters of retrieved context that fit the prompt.
+        
+        Bounded by max_context_chars and by what remains of the context
+        window after the system prompt, question and completion, so an
+        oversized prompt is cut locally instead of failing at the API.
+        """
+        remaining_tokens = (self.context_window - self._system_tokens - max_tokens
+                            - self._estimate_tokens(query) - PROMPT_OVERHEAD_TOKENS)
+        return max(0, min(self.max_context_chars, remaining_tokens * CHARS_PER_TOKEN))
     
     def update_config(self, temperature=None, max_tokens=None, model=None):
         """Update configuration parameters."""
@@ -27,59 +255,411 @@ class ResponseGenerator:
             self.max_tokens = max_tokens
         if model is not None:
             self.model = model
+        self._refresh_config()
     
-    def get_config(self):
-        """Get current configuration."""
-        return {
+    def _refresh_config(self):
+        """Rebuild the read-only configuration snapshot returned by get_config."""
+        self._config = MappingProxyType({
             "temperature": self.temperature,
             "max_tokens": self.max_tokens,
             "model": self.model
+        })
+    
+    def get_config(self):
+        """Get current configuration as a shared read-only mapping."""
+        return self._config
+    
+    def _embed_query(self, query):
+        """Embed the query for the response cache; returns None if unavailable."""
+        try:
+            vector = np.asarray(self.db_manager.embed_query(query), dtype=np.float32)
+            return vector if vector.size else None
+        except Exception:
+            return None
+    
+    def _cache_key(self, temperature, max_tokens):
+        """Generation parameters a cached answer must have been produced with."""
+        return (
+            self.model,
+            temperature if temperature is not None else self.temperature,
+            max_tokens if max_tokens is not None else self.max_tokens
+        )
+    
+    def clear_response_cache(self):
+        """Drop all answers cached in this process."""
+        with self._exact_cache_lock:
+            self._exact_cache.clear()
+        self.response_cache.clear()
+    
+    def _lookup(self, query, cache_key):
+        """
+        Find a cached answer for the query.
+        
+        Tries the exact-match cache before embedding the query, then the
+        semantic and Redis caches. Returns (cached answer or None, query
+        embedding or None); the embedding is reused for retrieval.
+        """
+        exact_key = self._exact_key(query, cache_key)
+        with self._exact_cache_lock:
+            entry = self._exact_cache.get(exact_key)
+            if entry is not None:
+                timestamp, result = entry
+                if time.time() - timestamp <= self.cache_ttl:
+                    self._exact_cache.move_to_end(exact_key)
+                    return dict(result), None
+                del self._exact_cache[exact_key]
+        
+        query_vector = self._embed_query(query)
+        return self._cached_response(query, query_vector, cache_key), query_vector
+    
+    @staticmethod
+    def _exact_key(query, cache_key):
+        parts = [" ".join(query.lower().split()), *map(str, cache_key)]
+        return hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=16).digest()
+    
+    def _cached_response(self, query, query_vector, cache_key):
+        """Look the query up in the semantic cache, then in the shared Redis cache."""
+        if query_vector is not None:
+            cached = self.response_cache.get(query_vector, key=cache_key)
+            if cached is not None:
+                return dict(cached)
+        
+        cached = self.l2_cache.get(self._l2_key(query, cache_key))
+        if cached is not None and query_vector is not None:
+            self.response_cache.put(query_vector, dict(cached), key=cache_key)
+        return cached
+    
+    def _store_response(self, query, query_vector, cache_key, result):
+        """Write an answer to every cache tier."""
+        exact_key = self._exact_key(query, cache_key)
+        with self._exact_cache_lock:
+            self._exact_cache[exact_key] = (time.time(), dict(result))
+            self._exact_cache.move_to_end(exact_key)
+            if len(self._exact_cache) > RESPONSE_CACHE_SIZE:
+                self._exact_cache.popitem(last=False)  # Evict least recently used
+        if query_vector is not None:
+            self.response_cache.put(query_vector, dict(result), key=cache_key)
+        self.l2_cache.set(self._l2_key(query, cache_key), dict(result), RESPONSE_TTL)
+    
+    def _l2_key(self, query, cache_key):
+        return self.l2_cache.key("resp", " ".join(query.lower().split()), *cache_key)
+    
+    def _search(self, query, query_vector=None):
+        """
+        Retrieve patent and BIS context documents for the query.
+        
+        When the query embedding is already known both collections are
+        searched with it directly, so the query is embedded at most once.
+        The two searches are I/O bound and run concurrently.
+        """
+        if query_vector is not None:
+            search, target = self.db_manager.search_vector, query_vector
+        else:
+            search, target = self.db_manager.search, query
+        patent_future = _search_pool.submit(search, "patent_faqs", target, limit=2)
+        bis_future = _search_pool.submit(search, "bis_faqs", target, limit=2)
+        return patent_future.result(), bis_future.result()
+    
+    async def _asearch(self, query, query_vector=None):
+        """Run the patent and BIS searches concurrently."""
+        search_kwargs = self._search_kwargs(query_vector)
+        patent_results, bis_results = await asyncio.gather(
+            self.db_manager.asearch("patent_faqs", query, **search_kwargs),
+            self.db_manager.asearch("bis_faqs", query, **search_kwargs)
+        )
+        return patent_results, bis_results
+    
+    @staticmethod
+    def _search_kwargs(query_vector):
+        search_kwargs = {"limit": 2}
+        if query_vector is not None:
+            search_kwargs["query_vector"] = query_vector
+        return search_kwargs
+    
+    def _completion_kwargs(self, query, patent_results, bis_results, temperature, max_tokens):
+        """Build the chat completion request for the query and retrieved context."""
+        # Combine and format the context with a single join
+        parts = []
+        if patent_results:
+            parts.append(self.PATENT_HEADER)
+            parts.extend(doc.page_content + "\n" for doc in patent_results)
+            parts.append("\n")
+        if bis_results:
+            parts.append(self.BIS_HEADER)
+            parts.extend(doc.page_content + "\n" for doc in bis_results)
+        
+        # Use per-call parameters if provided, otherwise use instance defaults
+        max_tokens = max_tokens if max_tokens is not None else self.max_tokens
+        context = "".join(parts)[:self._context_budget(query, max_tokens)]
+        
+        # The static system prompt goes first so providers can reuse its prefix cache
+        return {
+            "model": self.model,
+            "messages": [
+                self._system_message,
+                {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {query}"}
+            ],
+            "temperature": temperature if temperature is not None else self.temperature,
+            "max_tokens": max_tokens
         }
     
+    @staticmethod
+    def _source(patent_results, bis_results):
+        """Get the source document if available."""
+        if patent_results:
+            return patent_results[0].metadata.get('source')
+        if bis_results:
+            return bis_results[0].metadata.get('source')
+        return None
+    
+    @classmethod
+    def _format_response(cls, response, patent_results, bis_results):
+        """Extract the answer and the source document from a completion."""
+        return {
+            "answer": response.choices[0].message.content.strip(),
+            "source": cls._source(patent_results, bis_results)
+        }
+    
+    def generate(self, context, query, chat_history=None, sources=None):
+        """
+        Answer a query from caller-supplied context.
+        
+        Used by the command-line loop in main.py, which does its own
+        retrieval. Prior chat turns are replayed before the question and
+        the sources are appended unless the model reports it has no answer.
+        
+        Returns:
+            The answer text
+        """
+        messages = [self._json_system_message]
+        messages.extend(
+            {"role": message["role"], "content": message["content"]}
+            for message in chat_history or []
+        )
+        budget = self._context_budget(query, self.max_tokens)
+        messages.append({"role": "user", "content": f"Context:\n{context[:budget]}\n\nQuestion: {query}"})
+        
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                response_format={"type": "json_object"}
+            )
+        except Exception as e:
+            print(f"Error generating response: {str(e)}")
+            return self.ERROR_MESSAGE
+        
+        response_content, has_answer = self._parse_answer(response.choices[0].message.content)
+        if sources and has_answer:
+            source_text = ", ".join(source for source in sources if source)
+            if source_text:
+                response_content += f"\n\nSources: {source_text}"
+        return response_content
+    
+    @staticmethod
+    def _parse_answer(content):
+        """Return (answer, has_answer) from a JSON-mode reply, falling back to the NO_INFO sentinel."""
+        try:
+            payload = json.loads(content)
+            return str(payload["answer"]).strip(), bool(payload.get("has_answer", True))
+        except (ValueError, TypeError, KeyError):
+            answer = content.strip()
+            return answer, NO_INFO not in answer
+    
     def generate_response(self, query, temperature=None, max_tokens=None):
         """Generate a response based on the user's query."""
         try:
-            # Search for relevant documents
-            patent_results = self.db_manager.search("patent_faqs", query, limit=2)
-            bis_results = self.db_manager.search("bis_faqs", query, limit=2)
-            
-            # Combine and format the context
-            context = ""
-            if patent_results:
-                context += "Patent Information:\n" + "\n".join([doc.page_content for doc in patent_results]) + "\n\n"
-            if bis_results:
-                context += "BIS Information:\n" + "\n".join([doc.page_content for doc in bis_results])
+            # Serve semantically equivalent queries from the cache
+            cache_key = self._cache_key(temperature, max_tokens)
+            cached, query_vector = self._lookup(query, cache_key)
+            if cached is not None:
+                return cached
             
-            # Use per-call parameters if provided, otherwise use instance defaults
-            call_temperature = temperature if temperature is not None else self.temperature
-            call_max_tokens = max_tokens if max_tokens is not None else self.max_tokens
+            # Search for relevant documents
+            patent_results, bis_results = self._search(query, query_vector)
             
             # Generate response using Groq
             response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that provides information about patents and BIS standards. Use the provided context to answer questions accurately."},
-                    {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {query}"}
-                ],
-                temperature=call_temperature,
-                max_tokens=call_max_tokens
+                **self._completion_kwargs(query, patent_results, bis_results, temperature, max_tokens)
             )
             
-            # Get the source document if available
-            source = None
-            if patent_results:
-                source = patent_results[0].metadata.get('source')
-            elif bis_results:
-                source = bis_results[0].metadata.get('source')
-            
+            result = self._format_response(response, patent_results, bis_results)
+            self._store_response(query, query_vector, cache_key, result)
+            return result
+        
+        except Exception as e:
+            print(f"Error generating response: {str(e)}")
             return {
-                "answer": response.choices[0].message.content.strip(),
-                "source": source
+                "answer": self.ERROR_MESSAGE,
+                "source": None
             }
+    
+    def stream_response(self, query, temperature=None, max_tokens=None):
+        """
+        Stream a response based on the user's query.
+        
+        Retrieval runs before returning; the answer is then produced lazily.
+        
+        Returns:
+            Tuple of (iterator of answer text chunks as Groq emits them, source)
+        """
+        try:
+            # Serve semantically equivalent queries from the cache
+            cache_key = self._cache_key(temperature, max_tokens)
+            cached, query_vector = self._lookup(query, cache_key)
+            if cached is not None:
+                return iter([cached["answer"]]), cached["source"]
             
+            # Search for relevant documents
+            patent_results, bis_results = self._search(query, query_vector)
+            
+            # Open a streaming completion with Groq
+            stream = self.client.chat.completions.create(
+                **self._completion_kwargs(query, patent_results, bis_results, temperature, max_tokens),
+                stream=True
+            )
+        except Exception as e:
+            print(f"Error generating response: {str(e)}")
+            return iter([self.ERROR_MESSAGE]), None
+        
+        source = self._source(patent_results, bis_results)
+        return self._iter_stream(stream, query, query_vector, cache_key, source), source
+    
+    def _iter_stream(self, stream, query, query_vector, cache_key, source):
+        """Yield streamed answer text and cache the full answer once complete."""
+        parts = []
+        try:
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not parts and delta:
+                    delta = delta.lstrip()  # Match the stripped non-streaming answer
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            print(f"Error streaming response: {str(e)}")
+            if not parts:
+                yield self.ERROR_MESSAGE
+            return
+        
+        answer = "".join(parts).strip()
+        if answer:
+            self._store_response(query, query_vector, cache_key, {"answer": answer, "source": source})
+    
+    async def agenerate_response(self, query, temperature=None, max_tokens=None):
+        """
+        Async variant of generate_response.
+        
+        Lets callers overlap many requests with asyncio.gather; at most
+        max_concurrency completion calls are in flight at once.
+        """
+        try:
+            # Serve semantically equivalent queries from the cache
+            cache_key = self._cache_key(temperature, max_tokens)
+            cached, query_vector = await asyncio.to_thread(self._lookup, query, cache_key)
+            if cached is not None:
+                return cached
+            
+            # Search both collections concurrently
+            patent_results, bis_results = await self._asearch(query, query_vector)
+            
+            # Generate response using Groq
+            response = await self._achat(
+                self._completion_kwargs(query, patent_results, bis_results, temperature, max_tokens)
+            )
+            
+            result = self._format_response(response, patent_results, bis_results)
+            await asyncio.to_thread(self._store_response, query, query_vector, cache_key, result)
+            return result
+        
         except Exception as e:
             print(f"Error generating response: {str(e)}")
             return {
-                "answer": "I apologize, but I encountered an error while processing your request. Please try again.",
+                "answer": self.ERROR_MESSAGE,
                 "source": None
-            }
\ No newline at end of file
+            }
+    
+    def generate_batch(self, queries, temperature=None, max_tokens=None, realtime=True,
+                       poll_interval=30, timeout=None):
+        """
+        Generate responses for many queries.
+        
+        With realtime=True the queries are answered concurrently through
+        agenerate_response. With realtime=False they are submitted as one
+        job to Groq's Batch API, which is cheaper and does not compete with
+        interactive traffic for rate limits, but may take up to 24h; use it
+        only for offline workloads such as evaluations or re-generation.
+        
+        Returns:
+            List of {"answer", "source"} dicts in the same order as queries
+        """
+        if not queries:
+            return []
+        
+        if realtime:
+            async def run():
+                try:
+                    return await asyncio.gather(*[
+                        self.agenerate_response(query, temperature, max_tokens) for query in queries
+                    ])
+                finally:
+                    # asyncio.run closes this loop, so release its connections now
+                    await self.aclose()
+            return asyncio.run(run())
+        
+        # Retrieve context up front and write one request line per query
+        lines = []
+        sources = []
+        for i, query in enumerate(queries):
+            patent_results, bis_results = self._search(query)
+            lines.append(json.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": self.BATCH_ENDPOINT,
+                "body": self._completion_kwargs(query, patent_results, bis_results, temperature, max_tokens)
+            }))
+            sources.append(self._source(patent_results, bis_results))
+        
+        batch_input = self.client.files.create(
+            file=("batch_input.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            completion_window="24h",
+            endpoint=self.BATCH_ENDPOINT,
+            input_file_id=batch_input.id
+        )
+        
+        # Poll until the job finishes
+        started = time.monotonic()
+        while batch.status not in self.BATCH_TERMINAL_STATUSES:
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError(f"Batch {batch.id} did not finish within {timeout}s")
+            time.sleep(poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+        
+        if batch.status != "completed" or not batch.output_file_id:
+            raise RuntimeError(f"Batch {batch.id} ended with status '{batch.status}'")
+        
+        # Map custom_id -> answer; requests that failed get the apology message
+        answers = {}
+        output = self.client.files.content(batch.output_file_id).read().decode("utf-8")
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            try:
+                answers[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"].strip()
+            except (KeyError, IndexError, TypeError):
+                print(f"Error in batch request {record.get('custom_id')}: {record.get('error')}")
+        
+        return [
+            {
+                "answer": answers.get(str(i), self.ERROR_MESSAGE),
+                "source": sources[i] if str(i) in answers else None
+            }
+            for i in range(len(queries))
+        ]
@@ -1,23 +1,119 @@
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import hashlib
+import os
+import joblib
 import numpy as np
+from utils.embedder import INT8_SCALE, quantize_int8
 
 
 class SuggestionEngine:
-    def __init__(self):
+    def __init__(self, cache_path=None, embedder=None, hnsw_m=32, ef_construction=200, ef_search=64,
+                 quantize=False):
         self.vectorizer = TfidfVectorizer(stop_words='english')
         self.questions = []
+        self.question_vectors = None
+        # Optional joblib file holding the fitted vectorizer and question matrix
+        self.cache_path = cache_path
+        # When an embedder is given, questions are matched on dense embeddings
+        # through an HNSW index (faiss, if installed) instead of TF-IDF
+        self.embedder = embedder
+        self.hnsw_m = hnsw_m
+        # Candidate list sizes while building and querying the graph; larger
+        # values raise recall at the cost of build time and query latency
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        # Store question embeddings as 8-bit codes (4x smaller than float32)
+        self.quantize = quantize
+        self.index = None
 
     def load_questions(self, questions):
         self.questions = questions
-        if questions:
-            self.question_vectors = self.vectorizer.fit_transform(questions)
+        if not questions:
+            return
+
+        if self.embedder is not None:
+            self._build_dense_index(questions)
+            return
+
+        corpus_hash = hashlib.sha256("\n".join(questions).encode("utf-8")).hexdigest()
+        if self._load_cached(corpus_hash):
+            return
+
+        self.question_vectors = self.vectorizer.fit_transform(questions)
+        if self.cache_path:
+            try:
+                joblib.dump((corpus_hash, self.vectorizer, self.question_vectors), self.cache_path)
+            except Exception as e:
+                print(f"Error saving suggestion cache: {e}")
+
+    def _load_cached(self, corpus_hash):
+        """Restore the fitted vectorizer if the cache was built from the same questions."""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return False
+        try:
+            cached_hash, vectorizer, question_vectors = joblib.load(self.cache_path)
+        except Exception as e:
+            print(f"Error loading suggestion cache: {e}")
+            return False
+        if cached_hash != corpus_hash:
+            return False
+        self.vectorizer, self.question_vectors = vectorizer, question_vectors
+        return True
+
+    def _embed(self, texts):
+        """Embed texts and L2-normalize so inner product equals cosine similarity."""
+        vectors = np.asarray(self.embedder.generate(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(vectors / norms)
+
+    def _build_dense_index(self, questions):
+        vectors = self._embed(questions)
+        try:
+            import faiss
+        except ImportError:
+            # Exact inner-product search over the normalized matrix
+            self.index = quantize_int8(vectors) if self.quantize else vectors
+            return
+        if self.quantize:
+            index = faiss.IndexHNSWSQ(vectors.shape[1], faiss.ScalarQuantizer.QT_8bit,
+                                      self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+        else:
+            index = faiss.IndexHNSWFlat(vectors.shape[1], self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = self.ef_construction
+        index.add(vectors)
+        index.hnsw.efSearch = self.ef_search
+        self.index = index
+
+    @staticmethod
+    def _top_k_indices(scores, top_k):
+        """Indices of the top_k highest scores, best first."""
+        top_k = min(top_k, len(scores))
+        if top_k <= 0:
+            return []
+        top_indices = np.argpartition(-scores, top_k - 1)[:top_k]
+        return top_indices[np.argsort(-scores[top_indices])]
 
     def get_suggestions(self, query, top_k=3):
         if not self.questions:
             return []
         
+        if self.embedder is not None:
+            query_vec = self._embed([query])
+            if isinstance(self.index, np.ndarray):
+                # int8 codes are scaled unit vectors, so dividing restores the cosine scale
+                scores = self.index @ query_vec[0]
+                if self.index.dtype == np.int8:
+                    scores /= INT8_SCALE
+                top_indices = self._top_k_indices(scores, top_k)
+            else:
+                _, ids = self.index.search(query_vec, min(top_k, len(self.questions)))
+                top_indices = [i for i in ids[0] if i >= 0]
+            return [self.questions[i] for i in top_indices]
+
         query_vec = self.vectorizer.transform([query])
-        similarities = cosine_similarity(query_vec, self.question_vectors)
-        top_indices = np.argsort(similarities[0])[-top_k:][::-1]
-        return [self.questions[i] for i in top_indices]
\ No newline at end of file
+        # TF-IDF rows are L2-normalized, so a sparse dot product is the cosine similarity
+        similarities = (self.question_vectors @ query_vec.T).toarray().ravel()
+        top_indices = self._top_k_indices(similarities, top_k)
+        return [self.questions[i] for i in top_indices]
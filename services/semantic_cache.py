@@ -0,0 +1,95 @@
+import threading
+import time
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Similarity-keyed cache for generated answers.
+    
+    Entries are stored against an L2-normalized query embedding; a lookup
+    returns the value of the closest entry whose cosine similarity is at
+    least `threshold`, has not outlived `ttl` seconds and was stored under
+    the same `key` (e.g. the generation parameters).
+    
+    Embeddings live in a preallocated ring of `max_entries` rows, so a
+    store writes one row in place. Once the ring is full, a store replaces
+    an expired entry if there is one and otherwise the least recently hit.
+    """
+    
+    def __init__(self, threshold=0.92, ttl=3600, max_entries=512):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._vectors = None  # (max_entries, dim) float32 ring of normalized embeddings
+        self._entries = []    # (key, value) per filled slot
+        self._created = np.zeros(max_entries)    # store time per slot, for the TTL
+        self._last_used = np.zeros(max_entries, dtype=np.int64)  # use counter per slot, for LRU eviction
+        self._uses = 0
+        self._size = 0        # filled slots; also the write cursor until the ring is full
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+    
+    def get(self, vector, key=None):
+        """Return the cached value for the nearest matching entry, or None."""
+        query = self._normalize(vector)
+        if query is None:
+            return None
+        
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != query.shape[0]:
+                return None
+            
+            scores = self._vectors[:self._size] @ query
+            now = time.time()
+            candidates = np.flatnonzero(scores >= self.threshold)
+            for idx in candidates[np.argsort(-scores[candidates])]:
+                entry_key, value = self._entries[idx]
+                if entry_key == key and now - self._created[idx] <= self.ttl:
+                    self._uses += 1
+                    self._last_used[idx] = self._uses
+                    return value
+        return None
+    
+    def put(self, vector, value, key=None):
+        """Store a value against the embedding, replacing an expired or the least recently used entry when full."""
+        row = self._normalize(vector)
+        if row is None:
+            return
+        
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != row.shape[0]:
+                self._vectors = np.zeros((self.max_entries, row.shape[0]), dtype=np.float32)
+                self._entries = []
+                self._size = 0
+            
+            now = time.time()
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+                self._entries.append(None)
+            else:
+                expired = now - self._created > self.ttl
+                slot = int(np.argmax(expired)) if expired.any() else int(np.argmin(self._last_used))
+            
+            self._vectors[slot] = row
+            self._entries[slot] = (key, value)
+            self._created[slot] = now
+            self._uses += 1
+            self._last_used[slot] = self._uses
+    
+    def clear(self):
+        """Drop all cached entries."""
+        with self._lock:
+            self._vectors = None
+            self._entries = []
+            self._size = 0
+    
+    def __len__(self):
+        return self._size
@@ -1,4 +1,5 @@
 from typing import List
+import re
 import openai
 from dotenv import load_dotenv
 import os
@@ -6,6 +7,22 @@ import os
 load_dotenv()
 
 class SuggestionEngine:
+    KEYWORDS = {
+        "patent": ["patent", "invention", "intellectual property"],
+        "bis": ["bis", "certification", "standard"]
+    }
+    # One alternation over every category, so the input is scanned once
+    # however many keywords there are; the named group reports the category.
+    # Keywords match at word starts, so "patents" or "standards" still hit
+    # but "bis" does not fire inside words like "this"
+    KEYWORD_PATTERN = re.compile(
+        r'\b(?:' + '|'.join(
+            f'(?P<{category}>' + '|'.join(map(re.escape, keywords)) + ')'
+            for category, keywords in KEYWORDS.items()
+        ) + ')',
+        re.IGNORECASE
+    )
+    
     def __init__(self):
         self.patent_suggestions = [
             "What is the patent application process?",
@@ -23,16 +40,26 @@ class SuggestionEngine:
             "How do I apply for BIS certification?"
         ]
 
+    def _match_categories(self, user_input):
+        """Keyword categories present in the input, found in a single scan."""
+        categories = set()
+        for match in self.KEYWORD_PATTERN.finditer(user_input):
+            categories.add(match.lastgroup)
+            if len(categories) == len(self.KEYWORDS):
+                break
+        return categories
+
     def generate_suggestions(self, user_input, response):
         """Generate relevant follow-up questions based on user input and response."""
         suggestions = []
+        categories = self._match_categories(user_input)
         
         # Add patent-related suggestions if the input contains patent-related keywords
-        if any(keyword in user_input.lower() for keyword in ['patent', 'invention', 'intellectual property']):
+        if "patent" in categories:
             suggestions.extend(self.patent_suggestions[:2])
         
         # Add BIS-related suggestions if the input contains BIS-related keywords
-        if any(keyword in user_input.lower() for keyword in ['bis', 'certification', 'standard']):
+        if "bis" in categories:
             suggestions.extend(self.bis_suggestions[:2])
         
         # If no specific suggestions were added, add one from each category
@@ -88,33 +88,41 @@ class Theme:
         '2xl': '0 25px 50px -12px rgba(0, 0, 0, 0.25)',
     }
     
+    # Generated CSS is memoized on first use; the palette is static
+    _css_variables = None
+    _component_styles = None
+    
     @classmethod
     def get_css_variables(cls):
         """Generate CSS custom properties from theme configuration."""
-        css_vars = ":root {\n"
-        
-        # Colors
-        for name, value in cls.COLORS.items():
-            css_vars += f"  --color-{name.replace('_', '-')}: {value};\n"
-        
-        # Spacing
-        for name, value in cls.SPACING.items():
-            css_vars += f"  --spacing-{name}: {value};\n"
-        
-        # Border radius
-        for name, value in cls.RADIUS.items():
-            css_vars += f"  --radius-{name}: {value};\n"
-        
-        # Fonts
-        for name, value in cls.FONTS.items():
-            css_vars += f"  --font-{name}: {value};\n"
-        
-        css_vars += "}\n"
-        return css_vars
+        if cls._css_variables is None:
+            lines = [":root {\n"]
+            
+            # Colors
+            lines.extend(f"  --color-{name.replace('_', '-')}: {value};\n" for name, value in cls.COLORS.items())
+            
+            # Spacing
+            lines.extend(f"  --spacing-{name}: {value};\n" for name, value in cls.SPACING.items())
+            
+            # Border radius
+            lines.extend(f"  --radius-{name}: {value};\n" for name, value in cls.RADIUS.items())
+            
+            # Fonts
+            lines.extend(f"  --font-{name}: {value};\n" for name, value in cls.FONTS.items())
+            
+            lines.append("}\n")
+            cls._css_variables = "".join(lines)
+        return cls._css_variables
     
     @classmethod
     def get_component_styles(cls):
         """Get component-specific styles."""
+        if cls._component_styles is None:
+            cls._component_styles = cls._build_component_styles()
+        return dict(cls._component_styles)
+    
+    @classmethod
+    def _build_component_styles(cls):
         return {
             'button_primary': f"""
                 background: linear-gradient(135deg, {cls.COLORS['primary']}, {cls.COLORS['primary_dark']});
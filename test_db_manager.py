@@ -13,11 +13,13 @@ Tests the VectorDBManager class functionality including:
 import pytest
 import os
 import sys
+import numpy as np
 from unittest.mock import Mock, patch, MagicMock
 
 # Mock pinecone imports at module level
 with patch.dict('sys.modules', {
     'pinecone': Mock(),
+    'pinecone.grpc': Mock(),
     'pinecone.Pinecone': Mock(),
     'pinecone.ServerlessSpec': Mock()
 }):
@@ -82,14 +84,19 @@ class TestVectorDBManager:
         mock_pc.list_indexes.return_value = []  # No existing indexes
         mock_index = Mock()
         mock_pc.Index.return_value = mock_index
+        mock_pc.describe_index.side_effect = [
+            Mock(status={'ready': False}),
+            Mock(status={'ready': True})
+        ]
         mock_pinecone.return_value = mock_pc
         
         # Initialize VectorDBManager
         db_manager = VectorDBManager()
         
-        # Verify index creation was called
+        # Verify index creation was called and readiness polled
         mock_pc.create_index.assert_called_once()
-        mock_sleep.assert_called_once_with(10)  # Wait time for creation
+        assert mock_pc.describe_index.call_count == 2
+        mock_sleep.assert_called_once_with(0.5)
     
     @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
     @patch('utils.db_manager.get_embedder')
@@ -132,14 +139,282 @@ class TestVectorDBManager:
         
         # First call - should generate embedding
         embedding1 = db_manager._get_embedding(test_text)
-        assert embedding1 == [0.1, 0.2, 0.3]
+        assert embedding1.dtype == np.float32
+        assert embedding1.tolist() == pytest.approx([0.1, 0.2, 0.3])
         assert mock_embedder.generate.call_count == 1
         
-        # Second call - should use cache
+        # Second call - should use cache, returning the exact float32 vector
         embedding2 = db_manager._get_embedding(test_text)
-        assert embedding2 == [0.1, 0.2, 0.3]
+        assert embedding2.dtype == np.float32
+        assert np.array_equal(embedding2, embedding1)
         assert mock_embedder.generate.call_count == 1  # No additional call
     
+    @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
+    @patch('utils.db_manager.EMBEDDING_CACHE_SIZE', 2)
+    @patch('utils.db_manager.get_embedder')
+    @patch('utils.db_manager.Pinecone')
+    def test_get_embedding_cache_lru_eviction(self, mock_pinecone, mock_get_embedder):
+        """Test the embedding cache evicts the least recently used text."""
+        mock_embedder = Mock()
+        mock_embedder.get_embedding_dimension.return_value = 384
+        mock_embedder.generate.return_value = [[0.1, 0.2, 0.3]]
+        mock_get_embedder.return_value = mock_embedder
+        
+        mock_pc = Mock()
+        mock_pc.list_indexes.return_value = [{'name': 'test-index'}]
+        mock_pinecone.return_value = mock_pc
+        
+        db_manager = VectorDBManager()
+        db_manager._get_embedding("a")
+        db_manager._get_embedding("b")
+        db_manager._get_embedding("a")  # Refresh "a"
+        db_manager._get_embedding("c")  # Evicts "b"
+        
+        assert list(db_manager.embeddings_cache) == ["a", "c"]
+        assert mock_embedder.generate.call_count == 3
+    
+    @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
+    @patch('utils.db_manager.EMBEDDING_CACHE_SIZE', 2)
+    @patch('utils.db_manager.get_embedder')
+    @patch('utils.db_manager.Pinecone')
+    def test_embedding_cache_concurrent_eviction(self, mock_pinecone, mock_get_embedder):
+        """Test threads hitting and evicting the LRU at once all get vectors."""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        mock_embedder = Mock()
+        mock_embedder.get_embedding_dimension.return_value = 384
+        mock_embedder.generate.side_effect = lambda texts: [[float(len(text)), 0.0] for text in texts]
+        mock_get_embedder.return_value = mock_embedder
+        
+        mock_pc = Mock()
+        mock_pc.list_indexes.return_value = [{'name': 'test-index'}]
+        mock_pinecone.return_value = mock_pc
+        
+        db_manager = VectorDBManager()
+        texts = ["q" * n for n in range(1, 6)] * 200
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            vectors = list(executor.map(db_manager._get_embedding, texts))
+        
+        assert [vector[0] for vector in vectors] == [float(len(text)) for text in texts]
+        assert len(db_manager.embeddings_cache) == 2
+    
+    @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
+    @patch('utils.db_manager.get_embedder')
+    @patch('utils.db_manager.Pinecone')
+    def test_embed_query_shares_cache_across_case_and_spacing(self, mock_pinecone, mock_get_embedder):
+        """Test query variants the uncased model embeds identically are embedded once."""
+        mock_embedder = Mock()
+        mock_embedder.provider = "sentence_transformers"
+        mock_embedder.get_embedding_dimension.return_value = 384
+        mock_embedder.generate.return_value = [[0.1, 0.2, 0.3]]
+        mock_get_embedder.return_value = mock_embedder
+        
+        mock_pc = Mock()
+        mock_pc.list_indexes.return_value = [{'name': 'test-index'}]
+        mock_pinecone.return_value = mock_pc
+        
+        db_manager = VectorDBManager()
+        db_manager.embed_query("What is a  Patent?")
+        db_manager.embed_query("  what is a patent? ")
+        
+        mock_embedder.generate.assert_called_once_with(["what is a patent?"])
+    
+    @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
+    @patch('utils.db_manager.get_embedder')
+    @patch('utils.db_manager.Pinecone')
+    def test_concurrent_query_embeddings_are_coalesced(self, mock_pinecone, mock_get_embedder):
+        """Test concurrent query embeddings share embedder calls and get their own vectors."""
+        import threading
+        import time
+        
+        def slow_generate(texts):
+            time.sleep(0.05)
+            return [[float(len(text)), 0.0, 0.0] for text in texts]
+        
+        mock_embedder = Mock()
+        mock_embedder.get_embedding_dimension.return_value = 384
+        mock_embedder.generate.side_effect = slow_generate
+        mock_get_embedder.return_value = mock_embedder
+        
+        mock_pc = Mock()
+        mock_pc.list_indexes.return_value = [{'name': 'test-index'}]
+        mock_pinecone.return_value = mock_pc
+        
+        db_manager = VectorDBManager()
+        results = {}
+        
+        def embed(n):
+            results[n] = db_manager._get_embedding("q" * n)
+        
+        threads = [threading.Thread(target=embed, args=(n,)) for n in range(1, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert {n: vector[0] for n, vector in results.items()} == {n: float(n) for n in range(1, 9)}
+        assert mock_embedder.generate.call_count < 8
+    
+    def test_coalesced_failure_only_fails_its_own_request(self):
+        """Test a blank or failing request does not fail texts merged with it."""
+        import threading
+        from utils.embed_pipeline import EmbeddingBatcher
+        
+        def embed_fn(texts):
+            if "bad" in texts:
+                raise RuntimeError("bad text")
+            return [[float(len(text))] for text in texts]
+        
+        # Hold batches open long enough for all requests to merge
+        batcher = EmbeddingBatcher(embed_fn, max_wait=0.1)
+        results = {}
+        
+        def embed(text):
+            try:
+                results[text] = batcher.embed([text])
+            except Exception as e:
+                results[text] = e
+        
+        threads = [threading.Thread(target=embed, args=(text,)) for text in ["one", "bad", "three", "   "]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert results["one"] == [[3.0]]
+        assert results["three"] == [[5.0]]
+        assert isinstance(results["bad"], RuntimeError)
+        assert isinstance(results["   "], ValueError)
+    
+    @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
+    @patch('utils.db_manager.get_embedder')
+    @patch('utils.db_manager.Pinecone')
+    def test_get_embedding_uses_redis_l2_cache(self, mock_pinecone, mock_get_embedder):
+        """Test an L1 miss is served from the shared Redis cache."""
+        import numpy as np
+        
+        mock_embedder = Mock()
+        mock_embedder.get_embedding_dimension.return_value = 384
+        mock_get_embedder.return_value = mock_embedder
+        
+        mock_pc = Mock()
+        mock_pc.list_indexes.return_value = [{'name': 'test-index'}]
+        mock_pinecone.return_value = mock_pc
+        
+        db_manager = VectorDBManager()
+        db_manager.l2_cache = Mock()
+        db_manager.l2_cache.get_vectors.return_value = [np.array([0.5, 0.25], dtype=np.float32)]
+        
+        embedding = db_manager._get_embedding("shared text")
+        
+        assert embedding.tolist() == [0.5, 0.25]
+        mock_embedder.generate.assert_not_called()
+        db_manager.l2_cache.set_vectors.assert_not_called()
+        assert "shared text" in db_manager.embeddings_cache
+    
+    @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
+    @patch('utils.db_manager.get_embedder')
+    @patch('utils.db_manager.Pinecone')
+    def test_get_embedding_persists_to_disk_cache(self, mock_pinecone, mock_get_embedder, tmp_path):
+        """Test embeddings survive a restart through the on-disk cache."""
+        from utils.embed_cache import EmbeddingDiskCache
+        
+        mock_embedder = Mock()
+        mock_embedder.provider = "sentence_transformers"
+        mock_embedder.get_model_signature.return_value = "sentence_transformers:onnx:384"
+        mock_embedder.get_embedding_dimension.return_value = 384
+        mock_embedder.generate.return_value = [[0.5, 0.25, 0.125]]
+        mock_get_embedder.return_value = mock_embedder
+        
+        mock_pc = Mock()
+        mock_pc.list_indexes.return_value = [{'name': 'test-index'}]
+        mock_pinecone.return_value = mock_pc
+        
+        cache_path = str(tmp_path / "embeddings.sqlite")
+        first = VectorDBManager()
+        first.disk_cache = EmbeddingDiskCache(path=cache_path)
+        assert first._get_embedding("persisted text").tolist() == [0.5, 0.25, 0.125]
+        
+        # A fresh manager has an empty LRU but finds the vector on disk
+        restarted = VectorDBManager()
+        restarted.disk_cache = EmbeddingDiskCache(path=cache_path)
+        restored = restarted._get_embedding("persisted text")
+        assert restored.tolist() == [0.5, 0.25, 0.125]
+        assert mock_embedder.generate.call_count == 1
+        restored[0] = 0.0  # Disk hits are writable copies, not views of the SQLite row
+        
+        # Vectors persisted by another backend are not reused
+        mock_embedder.get_model_signature.return_value = "sentence_transformers:onnx-int8:384"
+        switched = VectorDBManager()
+        switched.disk_cache = EmbeddingDiskCache(path=cache_path)
+        switched._get_embedding("persisted text")
+        assert mock_embedder.generate.call_count == 2
+    
+    @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
+    @patch('utils.db_manager.get_embedder')
+    @patch('utils.db_manager.Pinecone')
+    def test_search_with_precomputed_query_vector(self, mock_pinecone, mock_get_embedder):
+        """Test search reuses a caller-supplied query vector."""
+        mock_embedder = Mock()
+        mock_embedder.get_embedding_dimension.return_value = 384
+        mock_get_embedder.return_value = mock_embedder
+        
+        mock_pc = Mock()
+        mock_index = Mock()
+        mock_index.query.return_value = {'matches': []}
+        mock_pc.list_indexes.return_value = [{'name': 'test-index'}]
+        mock_pc.Index.return_value = mock_index
+        mock_pinecone.return_value = mock_pc
+        
+        db_manager = VectorDBManager()
+        db_manager.search('test-collection', 'test query', limit=2, query_vector=[0.4, 0.5, 0.6])
+        
+        mock_embedder.generate.assert_not_called()
+        assert mock_index.query.call_args[1]['vector'] == [0.4, 0.5, 0.6]
+        
+        db_manager.search_vector('test-collection', [0.7, 0.8, 0.9], limit=2)
+        
+        mock_embedder.generate.assert_not_called()
+        assert mock_index.query.call_args[1]['vector'] == [0.7, 0.8, 0.9]
+        assert mock_index.query.call_args[1]['top_k'] == 2
+    
+    @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
+    @patch('utils.db_manager.get_embedder')
+    @patch('utils.db_manager.Pinecone')
+    def test_asearch_embeds_off_the_event_loop(self, mock_pinecone, mock_get_embedder):
+        """Test async search embeds on the embedding pool and passes the vector on."""
+        import asyncio
+        import threading
+        
+        loop_thread = []
+        embed_threads = []
+        
+        def generate(texts):
+            embed_threads.append(threading.current_thread())
+            return [[0.1, 0.2, 0.3]]
+        
+        mock_embedder = Mock()
+        mock_embedder.get_embedding_dimension.return_value = 384
+        mock_embedder.generate.side_effect = generate
+        mock_get_embedder.return_value = mock_embedder
+        
+        mock_pc = Mock()
+        mock_index = Mock()
+        mock_index.query.return_value = {'matches': []}
+        mock_pc.list_indexes.return_value = [{'name': 'test-index'}]
+        mock_pc.Index.return_value = mock_index
+        mock_pinecone.return_value = mock_pc
+        
+        db_manager = VectorDBManager()
+        
+        async def run():
+            loop_thread.append(threading.current_thread())
+            return await db_manager.asearch('test-collection', 'test query', limit=2)
+        
+        assert asyncio.run(run()) == []
+        assert embed_threads and embed_threads[0] is not loop_thread[0]
+        assert mock_index.query.call_args[1]['vector'] == pytest.approx([0.1, 0.2, 0.3])
+    
     @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
     @patch('utils.db_manager.get_embedder')
     @patch('utils.db_manager.Pinecone')
@@ -168,9 +443,187 @@ class TestVectorDBManager:
         
         db_manager.upsert_embeddings('test-namespace', documents)
         
-        # Verify upsert was called
+        # Verify upsert was called with a single batched embedding call
         mock_index.upsert.assert_called_once()
-        mock_sleep.assert_called_once_with(0.1)  # Batch delay
+        # Embedded with its source as context; the raw text is what gets stored
+        mock_embedder.generate.assert_called_once_with(['[source=file]\ntest content'])
+        upserted = mock_index.upsert.call_args[1]['vectors']
+        assert upserted[0]['metadata']['page_content'] == 'test content'
+        mock_sleep.assert_not_called()  # No pacing delay without a 429
+    
+    @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
+    @patch('utils.db_manager.get_embedder')
+    @patch('utils.db_manager.Pinecone')
+    @patch('time.sleep')
+    def test_upsert_embeddings_batches_and_retries_on_429(self, mock_sleep, mock_pinecone, mock_get_embedder):
+        """Test each upsert batch is embedded in one call and 429s are retried with backoff."""
+        mock_embedder = Mock()
+        mock_embedder.get_embedding_dimension.return_value = 384
+        mock_embedder.generate.side_effect = lambda texts: [[0.1, 0.2, 0.3]] * len(texts)
+        mock_get_embedder.return_value = mock_embedder
+        
+        mock_pc = Mock()
+        mock_index = Mock()
+        rate_limited = Exception("(429) Too Many Requests")
+        rate_limited.status = 429
+        mock_index.upsert.side_effect = [rate_limited, None, None]
+        mock_pc.list_indexes.return_value = [{'name': 'test-index'}]
+        mock_pc.Index.return_value = mock_index
+        mock_pinecone.return_value = mock_pc
+        
+        db_manager = VectorDBManager()
+        
+        documents = [{
+            'page_content': f'content {i}',
+            'metadata': {'source': 'file.pdf', 'chunk_id': i}
+        } for i in range(150)]
+        
+        db_manager.upsert_embeddings('test-namespace', documents)
+        
+        # One embedder call per upsert batch
+        assert [len(call[0][0]) for call in mock_embedder.generate.call_args_list] == [100, 50]
+        # Two batches of 100 + 50 sent concurrently, one of them retried once
+        assert mock_index.upsert.call_count == 3
+        batch_sizes = sorted(len(call[1]['vectors']) for call in mock_index.upsert.call_args_list)
+        assert batch_sizes in ([50, 100, 100], [50, 50, 100])
+        mock_sleep.assert_called_once_with(0.5)
+    
+    @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
+    @patch('utils.db_manager.get_embedder')
+    @patch('utils.db_manager.Pinecone')
+    @patch('time.sleep')
+    def test_upsert_embeddings_embeds_only_distinct_cache_misses(self, mock_sleep, mock_pinecone, mock_get_embedder):
+        """Test upsert serves cached chunks and embeds each distinct miss once."""
+        mock_embedder = Mock()
+        mock_embedder.get_embedding_dimension.return_value = 384
+        mock_embedder.generate.return_value = [[0.1, 0.2, 0.3]]
+        mock_get_embedder.return_value = mock_embedder
+        
+        mock_pc = Mock()
+        mock_index = Mock()
+        mock_pc.list_indexes.return_value = [{'name': 'test-index'}]
+        mock_pc.Index.return_value = mock_index
+        mock_pinecone.return_value = mock_pc
+        
+        db_manager = VectorDBManager()
+        db_manager._cache_embedding('[source=file]\ncached chunk', [0.5, 0.25, 0.125])
+        
+        documents = [{
+            'page_content': text,
+            'metadata': {'source': 'file.pdf', 'chunk_id': i}
+        } for i, text in enumerate(['cached chunk', 'new chunk', 'new chunk'])]
+        
+        db_manager.upsert_embeddings('test-namespace', documents)
+        
+        mock_embedder.generate.assert_called_once_with(['[source=file]\nnew chunk'])
+        upserted = mock_index.upsert.call_args[1]['vectors']
+        assert upserted[0]['values'] == [0.5, 0.25, 0.125]
+        assert upserted[1]['values'] == upserted[2]['values'] == pytest.approx([0.1, 0.2, 0.3])
+        assert '[source=file]\nnew chunk' in db_manager.embeddings_cache
+    
+    @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
+    @patch('utils.db_manager.get_embedder')
+    @patch('utils.db_manager.Pinecone')
+    @patch('time.sleep')
+    def test_upsert_embeddings_skips_unchanged_chunks(self, mock_sleep, mock_pinecone, mock_get_embedder):
+        """Test re-indexing only embeds chunks whose stored hash differs."""
+        mock_embedder = Mock()
+        mock_embedder.get_embedding_dimension.return_value = 384
+        mock_embedder.generate.return_value = [[0.1, 0.2, 0.3]]
+        mock_get_embedder.return_value = mock_embedder
+        
+        mock_pc = Mock()
+        mock_index = Mock()
+        mock_pc.list_indexes.return_value = [{'name': 'test-index'}]
+        mock_pc.Index.return_value = mock_index
+        mock_pinecone.return_value = mock_pc
+        
+        db_manager = VectorDBManager()
+        documents = [{
+            'page_content': text,
+            'metadata': {'source': 'file.pdf', 'chunk_id': i}
+        } for i, text in enumerate(['unchanged chunk', 'edited chunk'])]
+        
+        unchanged_hash = db_manager._chunk_hash('[source=file]\nunchanged chunk')
+        mock_index.fetch.return_value = Mock(vectors={
+            'ns_file.pdf_0': Mock(metadata={'chunk_hash': unchanged_hash}),
+            'ns_file.pdf_1': Mock(metadata={'chunk_hash': 'stale'})
+        })
+        
+        db_manager.upsert_embeddings('ns', documents)
+        
+        mock_index.fetch.assert_called_once_with(ids=['ns_file.pdf_0', 'ns_file.pdf_1'], namespace='ns')
+        mock_embedder.generate.assert_called_once_with(['[source=file]\nedited chunk'])
+        upserted = mock_index.upsert.call_args[1]['vectors']
+        assert [vector['id'] for vector in upserted] == ['ns_file.pdf_1']
+        assert upserted[0]['metadata']['chunk_hash'] == db_manager._chunk_hash('[source=file]\nedited chunk')
+    
+    @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
+    @patch('utils.db_manager.get_embedder')
+    @patch('utils.db_manager.Pinecone')
+    @patch('time.sleep')
+    def test_upsert_embeddings_reembeds_after_model_change(self, mock_sleep, mock_pinecone, mock_get_embedder):
+        """Test a chunk hashed under another embedding backend is not skipped."""
+        mock_embedder = Mock()
+        mock_embedder.get_embedding_dimension.return_value = 384
+        mock_embedder.get_model_signature.return_value = "sentence_transformers:onnx:384"
+        mock_embedder.generate.return_value = [[0.1, 0.2, 0.3]]
+        mock_get_embedder.return_value = mock_embedder
+        
+        mock_pc = Mock()
+        mock_index = Mock()
+        mock_pc.list_indexes.return_value = [{'name': 'test-index'}]
+        mock_pc.Index.return_value = mock_index
+        mock_pinecone.return_value = mock_pc
+        
+        db_manager = VectorDBManager()
+        documents = [{'page_content': 'same chunk', 'metadata': {'source': 'file.pdf', 'chunk_id': 0}}]
+        fp32_hash = db_manager._chunk_hash('[source=file]\nsame chunk')
+        mock_index.fetch.return_value = Mock(vectors={
+            'ns_file.pdf_0': Mock(metadata={'chunk_hash': fp32_hash})
+        })
+        
+        mock_embedder.get_model_signature.return_value = "sentence_transformers:onnx-int8:384"
+        db_manager.upsert_embeddings('ns', documents)
+        
+        mock_embedder.generate.assert_called_once_with(['[source=file]\nsame chunk'])
+        upserted = mock_index.upsert.call_args[1]['vectors']
+        assert upserted[0]['metadata']['chunk_hash'] != fp32_hash
+    
+    @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
+    @patch('utils.db_manager.get_embedder')
+    @patch('utils.db_manager.Pinecone')
+    @patch('time.sleep')
+    def test_upsert_embeddings_precomputed_ndarray(self, mock_sleep, mock_pinecone, mock_get_embedder):
+        """Test upsert reuses precomputed NumPy embeddings without re-embedding."""
+        import numpy as np
+        
+        # Setup mocks
+        mock_embedder = Mock()
+        mock_embedder.get_embedding_dimension.return_value = 384
+        mock_get_embedder.return_value = mock_embedder
+        
+        mock_pc = Mock()
+        mock_index = Mock()
+        mock_pc.list_indexes.return_value = [{'name': 'test-index'}]
+        mock_pc.Index.return_value = mock_index
+        mock_pinecone.return_value = mock_pc
+        
+        db_manager = VectorDBManager()
+        
+        documents = [{
+            'page_content': 'test content',
+            'metadata': {'source': '/path/to/file.pdf', 'chunk_id': 0},
+            'embedding': np.array([0.5, 0.25, 0.125], dtype=np.float32)
+        }]
+        
+        db_manager.upsert_embeddings('test-namespace', documents)
+        
+        # Embedder is bypassed and values reach Pinecone as a plain list
+        mock_embedder.generate.assert_not_called()
+        upserted = mock_index.upsert.call_args[1]['vectors']
+        assert upserted[0]['values'] == [0.5, 0.25, 0.125]
+        assert isinstance(upserted[0]['values'], list)
     
     @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
     @patch('utils.db_manager.get_embedder')
@@ -205,17 +658,52 @@ class TestVectorDBManager:
         results = db_manager.query_embeddings('test-namespace', 'test query', top_k=5)
         
         # Verify query was called and results formatted correctly
-        mock_index.query.assert_called_once_with(
-            vector=[0.1, 0.2, 0.3],
-            namespace='test-namespace',
-            top_k=5,
-            include_metadata=True
-        )
+        mock_index.query.assert_called_once()
+        query_kwargs = mock_index.query.call_args[1]
+        assert query_kwargs['vector'] == pytest.approx([0.1, 0.2, 0.3])
+        assert isinstance(query_kwargs['vector'], list)
+        assert query_kwargs['namespace'] == 'test-namespace'
+        assert query_kwargs['top_k'] == 5
+        assert query_kwargs['include_metadata'] is True
         
         assert len(results) == 1
         assert results[0]['page_content'] == 'test result'
         assert results[0]['score'] == 0.95
     
+    @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
+    @patch('utils.db_manager.get_embedder')
+    @patch('utils.db_manager.Pinecone')
+    @patch('time.sleep')
+    def test_query_results_cached_until_namespace_changes(self, mock_sleep, mock_pinecone, mock_get_embedder):
+        """Test repeated searches hit the query cache and upserts invalidate it."""
+        mock_embedder = Mock()
+        mock_embedder.get_embedding_dimension.return_value = 384
+        mock_embedder.generate.return_value = [[0.1, 0.2, 0.3]]
+        mock_get_embedder.return_value = mock_embedder
+        
+        mock_pc = Mock()
+        mock_index = Mock()
+        mock_index.query.return_value = {'matches': []}
+        mock_pc.list_indexes.return_value = [{'name': 'test-index'}]
+        mock_pc.Index.return_value = mock_index
+        mock_pinecone.return_value = mock_pc
+        
+        db_manager = VectorDBManager()
+        db_manager.search_vector('test-namespace', [0.1, 0.2, 0.3], limit=2)
+        db_manager.search_vector('test-namespace', [0.1, 0.2, 0.30000001], limit=2)
+        assert mock_index.query.call_count == 1
+        
+        # A different top_k is a different result set
+        db_manager.search_vector('test-namespace', [0.1, 0.2, 0.3], limit=3)
+        assert mock_index.query.call_count == 2
+        
+        db_manager.upsert_embeddings('test-namespace', [{
+            'page_content': 'new content',
+            'metadata': {'source': 'file.pdf', 'chunk_id': 0}
+        }])
+        db_manager.search_vector('test-namespace', [0.1, 0.2, 0.3], limit=2)
+        assert mock_index.query.call_count == 3
+    
     @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
     @patch('utils.db_manager.get_embedder')
     @patch('utils.db_manager.Pinecone')
@@ -340,6 +828,45 @@ class TestVectorDBManager:
         mock_index.query.assert_called_once()
         assert len(results) == 1
         assert results[0]['page_content'] == 'indexed content'
+    
+    @patch.dict(os.environ, {'PINECONE_API_KEY': 'test-api-key', 'PINECONE_INDEX_NAME': 'test-index'})
+    @patch('utils.db_manager.get_embedder')
+    @patch('utils.db_manager.Pinecone')
+    def test_index_document_streams_generator_in_windows(self, mock_pinecone, mock_get_embedder):
+        """Test a document generator is embedded and upserted window by window."""
+        mock_embedder = Mock()
+        mock_embedder.get_embedding_dimension.return_value = 384
+        mock_embedder.generate.side_effect = lambda texts: [[0.1, 0.2, 0.3]] * len(texts)
+        mock_get_embedder.return_value = mock_embedder
+        
+        mock_pc = Mock()
+        mock_index = Mock()
+        mock_pc.list_indexes.return_value = [{'name': 'test-index'}]
+        mock_pc.Index.return_value = mock_index
+        mock_pinecone.return_value = mock_pc
+        
+        db_manager = VectorDBManager()
+        
+        documents = ({
+            'page_content': f'chunk {i}',
+            'metadata': {'source': 'file.pdf', 'chunk_id': i}
+        } for i in range(250))
+        
+        db_manager.index_document('test-collection', documents, {'source': 'faq.pdf'})
+        
+        assert [len(call[0][0]) for call in mock_embedder.generate.call_args_list] == [100, 100, 50]
+        upserted = [v for call in mock_index.upsert.call_args_list for v in call[1]['vectors']]
+        assert len(upserted) == 250
+        assert all(v['metadata']['source'] == 'faq.pdf' for v in upserted)
+    
+    def test_iter_chunks_matches_joined_text(self):
+        """Test chunking page by page gives the same chunks as the joined text."""
+        pages = ["alpha beta gamma", "delta epsilon", "", "zeta eta theta iota"]
+        
+        streamed = list(VectorDBManager._iter_chunks(pages, chunk_size=12))
+        
+        assert streamed == ['alpha beta gamma', 'delta epsilon', 'zeta eta theta', 'iota']
+        assert streamed == list(VectorDBManager._iter_chunks(["\n".join(pages)], chunk_size=12))
 
 
 if __name__ == "__main__":
@@ -9,16 +9,26 @@ Tests the EmbedderManager class functionality including:
 - Provider information retrieval
 """
 
+import time
 import pytest
-import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch, MagicMock
-from utils.embedder import EmbedderManager, get_embedder, generate
+from utils.embedder import EmbedderManager, get_embedder, generate, load_sentence_model, contextual_text, warm_up
 
 
 class TestEmbedderManager:
     """Test cases for EmbedderManager class."""
     
-    @patch.dict(os.environ, {}, clear=True)  # No API keys
+    @pytest.fixture(autouse=True)
+    def _env(self, monkeypatch):
+        """Run every test without API keys unless it sets one itself."""
+        monkeypatch.delenv('GROQ_API_KEY', raising=False)
+        # Each test patches SentenceTransformer, so drop any model loaded before
+        load_sentence_model.cache_clear()
+        yield
+        load_sentence_model.cache_clear()
+    
     @patch('utils.embedder.SentenceTransformer')
     def test_init_sentence_transformers_only(self, mock_sentence_transformer):
         """Test initialization when only sentence-transformers is available."""
@@ -32,10 +42,10 @@ class TestEmbedderManager:
         assert embedder.sentence_model == mock_model
         assert embedder.groq_client is None
     
-    @patch.dict(os.environ, {'GROQ_API_KEY': 'test-groq-key'})
     @patch('utils.embedder.SentenceTransformer')
-    def test_init_groq_fallback_to_sentence_transformers(self, mock_sentence_transformer):
+    def test_init_groq_fallback_to_sentence_transformers(self, mock_sentence_transformer, monkeypatch):
         """Test Groq initialization that falls back to sentence-transformers."""
+        monkeypatch.setenv('GROQ_API_KEY', 'test-groq-key')
         # Mock sentence transformer as fallback
         mock_model = Mock()
         mock_sentence_transformer.return_value = mock_model
@@ -47,25 +57,58 @@ class TestEmbedderManager:
         assert embedder.provider == "sentence_transformers"
         assert embedder.sentence_model == mock_model
     
-    @patch.dict(os.environ, {}, clear=True)
+    @patch('utils.embedder.SentenceTransformer')
+    def test_instances_share_loaded_model(self, mock_sentence_transformer):
+        """Test the model is loaded once and shared by every EmbedderManager."""
+        mock_model = Mock()
+        mock_sentence_transformer.return_value = mock_model
+        
+        first = EmbedderManager()
+        second = EmbedderManager(quantize=True)
+        
+        assert first.sentence_model is second.sentence_model is mock_model
+        assert second.backend == "onnx"
+        mock_sentence_transformer.assert_called_once()
+    
+    @patch('utils.embedder.SentenceTransformer')
+    def test_init_prefers_onnx_backend(self, mock_sentence_transformer):
+        """Test the ONNX backend is tried first and PyTorch is the fallback."""
+        mock_model = Mock()
+        mock_sentence_transformer.side_effect = [Exception("optimum not installed"), mock_model]
+        
+        embedder = EmbedderManager()
+        
+        assert embedder.sentence_model == mock_model
+        assert embedder.backend == "torch"
+        assert mock_sentence_transformer.call_args_list[0][1] == {'backend': 'onnx'}
+        assert embedder.get_provider_info()['backend'] == "torch"
+    
+    @patch('utils.embedder.SentenceTransformer')
+    def test_init_int8_model(self, mock_sentence_transformer, monkeypatch):
+        """Test EMBEDDING_INT8_MODEL loads the pre-quantized ONNX weights."""
+        monkeypatch.setenv('EMBEDDING_INT8_MODEL', '1')
+        mock_sentence_transformer.return_value = Mock()
+        
+        embedder = EmbedderManager()
+        
+        assert embedder.backend == "onnx-int8"
+        assert mock_sentence_transformer.call_args[1] == {
+            'backend': 'onnx', 'model_kwargs': {'file_name': 'onnx/model_qint8_avx512_vnni.onnx'}
+        }
+    
     def test_init_no_providers_available(self):
         """Test initialization fails when no providers are available."""
         with patch('utils.embedder.SentenceTransformer', side_effect=ImportError("Not available")):
             with pytest.raises(ImportError, match="Neither Groq nor sentence-transformers is available"):
                 EmbedderManager()
     
-    @patch.dict(os.environ, {}, clear=True)
     @patch('utils.embedder.SentenceTransformer')
     def test_generate_sentence_transformers(self, mock_sentence_transformer):
         """Test embedding generation using sentence-transformers."""
         # Mock sentence transformer
         mock_model = Mock()
         mock_embeddings = [[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]]
-        mock_numpy_arrays = [Mock() for _ in mock_embeddings]
-        for i, arr in enumerate(mock_numpy_arrays):
-            arr.tolist.return_value = mock_embeddings[i]
-        
-        mock_model.encode.return_value = mock_numpy_arrays
+        mock_model.encode.return_value = np.array(mock_embeddings, dtype=np.float32)
         mock_sentence_transformer.return_value = mock_model
         
         embedder = EmbedderManager()
@@ -73,14 +116,89 @@ class TestEmbedderManager:
         
         result = embedder.generate(test_texts)
         
-        assert result == mock_embeddings
+        assert isinstance(result, np.ndarray) and result.dtype == np.float32
+        np.testing.assert_allclose(result, mock_embeddings, rtol=1e-6)
         mock_model.encode.assert_called_once_with(
             test_texts,
+            batch_size=64,
             convert_to_numpy=True,
+            normalize_embeddings=True,
             show_progress_bar=False
         )
     
-    @patch.dict(os.environ, {}, clear=True)
+    @patch('utils.embedder.SentenceTransformer')
+    def test_generate_uses_cache_on_repeat(self, mock_sentence_transformer):
+        """Test repeated texts are served from the cache without re-encoding."""
+        mock_model = Mock()
+        mock_model.encode.return_value = np.array([[0.1, 0.2], [0.3, 0.4]], dtype=np.float32)
+        mock_sentence_transformer.return_value = mock_model
+        
+        embedder = EmbedderManager()
+        first = embedder.generate(["hello", "hello", "world"])
+        second = embedder.generate(["world", "hello"])
+        
+        # Duplicates within a call are encoded once, repeats across calls not at all
+        assert mock_model.encode.call_count == 1
+        assert mock_model.encode.call_args[0][0] == ["hello", "world"]
+        np.testing.assert_allclose(first, [[0.1, 0.2], [0.1, 0.2], [0.3, 0.4]], rtol=1e-6)
+        np.testing.assert_allclose(second, [[0.3, 0.4], [0.1, 0.2]], rtol=1e-6)
+    
+    @patch('utils.embedder.SentenceTransformer')
+    def test_generate_returns_independent_arrays(self, mock_sentence_transformer):
+        """Test results are float32 arrays callers can modify without touching the cache."""
+        mock_model = Mock()
+        mock_model.encode.return_value = np.array([[0.1, 0.2]], dtype=np.float32)
+        mock_sentence_transformer.return_value = mock_model
+        
+        embedder = EmbedderManager()
+        first = embedder.generate(["hello"])
+        first[0, 0] = 9.0
+        
+        assert embedder.generate_as_list(["hello"]) == pytest.approx([[0.1, 0.2]])
+    
+    @patch('utils.embedder.GENERATE_CACHE_SIZE', 2)
+    @patch('utils.embedder.SentenceTransformer')
+    def test_generate_cache_concurrent_eviction(self, mock_sentence_transformer):
+        """Test threads sharing one embedder can hit and evict the cache at once."""
+        mock_model = Mock()
+        mock_model.encode.side_effect = lambda texts, **kwargs: np.array(
+            [[float(len(text)), 0.0] for text in texts], dtype=np.float32
+        )
+        mock_sentence_transformer.return_value = mock_model
+        
+        embedder = EmbedderManager()
+        texts = ["t" * n for n in range(1, 6)] * 200
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda text: embedder.generate([text]), texts))
+        
+        assert [result[0, 0] for result in results] == [float(len(text)) for text in texts]
+        assert len(embedder._cache) == 2
+    
+    @patch('utils.embedder.SentenceTransformer')
+    def test_cache_key_depends_on_provider(self, mock_sentence_transformer):
+        """Test cached vectors are never served across providers."""
+        mock_sentence_transformer.return_value = Mock()
+        
+        embedder = EmbedderManager()
+        local_key = embedder._cache_key("hello")
+        embedder.provider = "groq"
+        
+        assert embedder._cache_key("hello") != local_key
+    
+    @patch('utils.embedder.SentenceTransformer')
+    def test_generate_quantized_int8(self, mock_sentence_transformer):
+        """Test quantize=True returns int8 vectors on a fixed scale."""
+        mock_model = Mock()
+        mock_model.encode.return_value = np.array([[1.0, -0.5, 0.0]], dtype=np.float32)
+        mock_sentence_transformer.return_value = mock_model
+        
+        embedder = EmbedderManager(quantize=True)
+        result = embedder.generate(["text 1"])
+        
+        assert result[0].dtype == np.int8
+        assert result[0].tolist() == [127, -64, 0]
+        assert embedder.get_provider_info()['dtype'] == 'int8'
+    
     @patch('utils.embedder.SentenceTransformer')
     def test_generate_empty_texts(self, mock_sentence_transformer):
         """Test embedding generation with empty text list."""
@@ -90,7 +208,6 @@ class TestEmbedderManager:
         with pytest.raises(ValueError, match="Input texts list cannot be empty"):
             embedder.generate([])
     
-    @patch.dict(os.environ, {}, clear=True)
     @patch('utils.embedder.SentenceTransformer')
     def test_generate_non_string_texts(self, mock_sentence_transformer):
         """Test embedding generation with non-string inputs."""
@@ -100,7 +217,6 @@ class TestEmbedderManager:
         with pytest.raises(ValueError, match="All elements in texts must be strings"):
             embedder.generate(["text", 123, "more text"])
     
-    @patch.dict(os.environ, {}, clear=True)
     @patch('utils.embedder.SentenceTransformer')
     def test_generate_empty_strings_filtered(self, mock_sentence_transformer):
         """Test embedding generation filters out empty strings."""
@@ -110,7 +226,6 @@ class TestEmbedderManager:
         with pytest.raises(ValueError, match="All texts are empty after filtering"):
             embedder.generate(["", "   ", "\t"])
     
-    @patch.dict(os.environ, {}, clear=True)
     @patch('utils.embedder.SentenceTransformer')
     def test_get_embedding_dimension_sentence_transformers(self, mock_sentence_transformer):
         """Test getting embedding dimension for sentence-transformers."""
@@ -121,7 +236,6 @@ class TestEmbedderManager:
         
         assert dimension == 384  # all-MiniLM-L6-v2 dimension
     
-    @patch.dict(os.environ, {}, clear=True)
     @patch('utils.embedder.SentenceTransformer')
     def test_get_provider_info(self, mock_sentence_transformer):
         """Test getting provider information."""
@@ -133,6 +247,18 @@ class TestEmbedderManager:
         assert info['provider'] == 'sentence_transformers'
         assert info['dimension'] == 384
         assert 'sentence-transformers/all-MiniLM-L6-v2' in info['model']
+        assert embedder.get_provider_info() is info  # Built once and reused
+    
+    def test_rank_against(self):
+        """Test cosine ranking of candidate vectors against a query."""
+        query = [1.0, 0.0]
+        matrix = [[2.0, 0.0], [0.0, 3.0], [1.0, 1.0], [0.0, 0.0]]
+        
+        scores = EmbedderManager.rank_against(query, matrix)
+        
+        np.testing.assert_allclose(scores, [1.0, 0.0, 2 ** -0.5, 0.0], rtol=1e-6)
+        with pytest.raises(ValueError, match="Matrix rows must match"):
+            EmbedderManager.rank_against(query, [[1.0, 0.0, 0.0]])
     
     def test_test_groq_embeddings(self):
         """Test Groq embedding availability check."""
@@ -149,18 +275,12 @@ class TestEmbedderManager:
         with pytest.raises(NotImplementedError, match="Groq embeddings not yet implemented"):
             embedder._generate_groq_embeddings(["test"])
     
-    @patch.dict(os.environ, {}, clear=True)
     @patch('utils.embedder.SentenceTransformer')
     def test_generate_with_progress_bar(self, mock_sentence_transformer):
         """Test embedding generation shows progress bar for large batches."""
         # Mock sentence transformer
         mock_model = Mock()
-        mock_embeddings = [[0.1] * 384 for _ in range(15)]  # 15 embeddings
-        mock_numpy_arrays = [Mock() for _ in mock_embeddings]
-        for i, arr in enumerate(mock_numpy_arrays):
-            arr.tolist.return_value = mock_embeddings[i]
-        
-        mock_model.encode.return_value = mock_numpy_arrays
+        mock_model.encode.return_value = np.full((15, 384), 0.1, dtype=np.float32)  # 15 embeddings
         mock_sentence_transformer.return_value = mock_model
         
         embedder = EmbedderManager()
@@ -171,7 +291,9 @@ class TestEmbedderManager:
         # Verify progress bar is enabled for large batches
         mock_model.encode.assert_called_once_with(
             test_texts,
+            batch_size=64,
             convert_to_numpy=True,
+            normalize_embeddings=True,
             show_progress_bar=True
         )
 
@@ -186,8 +308,7 @@ class TestModuleFunctions:
         mock_embedder_class.return_value = mock_instance
         
         # Clear any existing instance
-        import utils.embedder
-        utils.embedder._embedder_instance = None
+        get_embedder.cache_clear()
         
         # First call should create instance
         embedder1 = get_embedder()
@@ -198,6 +319,24 @@ class TestModuleFunctions:
         embedder2 = get_embedder()
         assert embedder2 == mock_instance
         assert mock_embedder_class.call_count == 1  # No additional call
+        
+        get_embedder.cache_clear()
+    
+    @patch('utils.embedder.EmbedderManager')
+    def test_get_embedder_concurrent_first_calls(self, mock_embedder_class):
+        """Test threads racing on a cold get_embedder build one instance."""
+        def slow_init():
+            time.sleep(0.05)
+            return Mock()
+        mock_embedder_class.side_effect = slow_init
+        get_embedder.cache_clear()
+        
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            instances = list(executor.map(lambda _: get_embedder(), range(4)))
+        
+        assert mock_embedder_class.call_count == 1
+        assert all(instance is instances[0] for instance in instances)
+        get_embedder.cache_clear()
     
     @patch('utils.embedder.get_embedder')
     def test_generate_convenience_function(self, mock_get_embedder):
@@ -213,11 +352,46 @@ class TestModuleFunctions:
         mock_get_embedder.assert_called_once()
         mock_embedder.generate.assert_called_once_with(test_texts)
 
+    
+    @patch('utils.embedder.get_embedder')
+    def test_warm_up_encodes_once_and_swallows_errors(self, mock_get_embedder):
+        """Test warm-up runs one uncached encode and only logs failures."""
+        mock_embedder = Mock()
+        mock_get_embedder.return_value = mock_embedder
+        
+        warm_up()
+        mock_embedder._generate_uncached.assert_called_once_with(["warmup"])
+        
+        mock_get_embedder.side_effect = RuntimeError("no provider")
+        warm_up()  # Does not raise
+
+class TestContextualText:
+    """Test the text embedded for document chunks."""
+    
+    def test_prefixes_source_and_section(self):
+        doc = {
+            'page_content': 'What is a patent?',
+            'metadata': {'source': 'data/FAQ-PATENT.pdf', 'section': 'Filing', 'chunk_id': 0}
+        }
+        
+        assert contextual_text(doc) == "[source=FAQ-PATENT] [section=Filing]\nWhat is a patent?"
+    
+    def test_without_metadata_returns_raw_text(self):
+        assert contextual_text({'page_content': 'raw', 'metadata': {}}) == 'raw'
+
 
 class TestErrorHandling:
     """Test error handling and edge cases."""
     
-    @patch.dict(os.environ, {}, clear=True)
+    @pytest.fixture(autouse=True)
+    def _env(self, monkeypatch):
+        """Run every test without API keys unless it sets one itself."""
+        monkeypatch.delenv('GROQ_API_KEY', raising=False)
+        # Each test patches SentenceTransformer, so drop any model loaded before
+        load_sentence_model.cache_clear()
+        yield
+        load_sentence_model.cache_clear()
+    
     @patch('utils.embedder.SentenceTransformer')
     def test_sentence_transformer_encoding_error(self, mock_sentence_transformer):
         """Test handling of sentence transformer encoding errors."""
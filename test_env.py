@@ -7,8 +7,11 @@ load_dotenv()
 # Get and print the API key (partially masked for security)
 api_key = os.getenv('OPENAI_API_KEY')
 if api_key:
-    # Show first 4 and last 4 characters of the API key
-    masked_key = api_key[:4] + '*' * (len(api_key) - 8) + api_key[-4:]
+    # Show first 4 and last 4 characters of the API key; mask short keys entirely
+    if len(api_key) > 8:
+        masked_key = f"{api_key[:4]}{'*' * (len(api_key) - 8)}{api_key[-4:]}"
+    else:
+        masked_key = '*' * len(api_key)
     print(f"API Key found: {masked_key}")
     print(f"API Key length: {len(api_key)}")
 else:
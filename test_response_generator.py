@@ -11,15 +11,33 @@ Tests the ResponseGenerator class functionality including:
 """
 
 import pytest
-import os
-from unittest.mock import Mock, patch, MagicMock
+import asyncio
+from dataclasses import dataclass, field
+from unittest.mock import Mock, AsyncMock, patch, MagicMock
 from services.response_generator import ResponseGenerator
 
 
+@dataclass(slots=True)
+class FakeDoc:
+    """Lightweight stand-in for a retrieved document."""
+    page_content: str
+    metadata: dict = field(default_factory=dict)
+
+
+def search_by_collection(patent, bis):
+    """Search side effect keyed on the collection, since both searches run concurrently."""
+    return lambda collection, *args, **kwargs: patent if collection == "patent_faqs" else bis
+
+
 class TestResponseGenerator:
     """Test cases for ResponseGenerator class."""
     
-    @patch.dict(os.environ, {'GROQ_API_KEY': 'test-groq-key'})
+    @pytest.fixture(autouse=True)
+    def _env(self, monkeypatch):
+        """Provide a Groq API key for every test in the class."""
+        monkeypatch.setenv('GROQ_API_KEY', 'test-groq-key')
+        yield
+    
     @patch('services.response_generator.Groq')
     def test_init_success(self, mock_groq):
         """Test successful initialization of ResponseGenerator."""
@@ -30,21 +48,20 @@ class TestResponseGenerator:
         response_gen = ResponseGenerator(mock_db_manager)
         
         assert response_gen.db_manager == mock_db_manager
-        assert response_gen.temperature == 0.7
-        assert response_gen.max_tokens == 500
-        assert response_gen.model == "deepseek-r1-distill-llama-70b"
+        assert response_gen.temperature == 0.2
+        assert response_gen.max_tokens == 300
+        assert response_gen.model == "llama-3.1-8b-instant"
         assert response_gen.client == mock_client
         mock_groq.assert_called_once_with(api_key='test-groq-key')
     
-    @patch.dict(os.environ, {}, clear=True)
-    def test_init_missing_api_key(self):
+    def test_init_missing_api_key(self, monkeypatch):
         """Test initialization fails when API key is missing."""
+        monkeypatch.delenv('GROQ_API_KEY')
         mock_db_manager = Mock()
         
         with pytest.raises(ValueError, match="GROQ_API_KEY not found"):
             ResponseGenerator(mock_db_manager)
     
-    @patch.dict(os.environ, {'GROQ_API_KEY': 'test-groq-key'})
     @patch('services.response_generator.Groq')
     def test_init_custom_parameters(self, mock_groq):
         """Test initialization with custom parameters."""
@@ -62,7 +79,6 @@ class TestResponseGenerator:
         assert response_gen.max_tokens == 300
         assert response_gen.model == "custom-model"
     
-    @patch.dict(os.environ, {'GROQ_API_KEY': 'test-groq-key'})
     @patch('services.response_generator.Groq')
     def test_update_config(self, mock_groq):
         """Test configuration update."""
@@ -75,8 +91,8 @@ class TestResponseGenerator:
         assert response_gen.temperature == 0.3
         assert response_gen.max_tokens == 200
         assert response_gen.model == "new-model"
+        assert response_gen.get_config()["model"] == "new-model"
     
-    @patch.dict(os.environ, {'GROQ_API_KEY': 'test-groq-key'})
     @patch('services.response_generator.Groq')
     def test_update_config_partial(self, mock_groq):
         """Test partial configuration update."""
@@ -93,7 +109,6 @@ class TestResponseGenerator:
         assert response_gen.max_tokens == original_max_tokens
         assert response_gen.model == original_model
     
-    @patch.dict(os.environ, {'GROQ_API_KEY': 'test-groq-key'})
     @patch('services.response_generator.Groq')
     def test_get_config(self, mock_groq):
         """Test getting current configuration."""
@@ -103,13 +118,15 @@ class TestResponseGenerator:
         
         config = response_gen.get_config()
         
-        assert config == {
+        assert dict(config) == {
             "temperature": 0.8,
             "max_tokens": 400,
-            "model": "deepseek-r1-distill-llama-70b"
+            "model": "llama-3.1-8b-instant"
         }
+        assert response_gen.get_config() is config
+        with pytest.raises(TypeError):
+            config["temperature"] = 0.1
     
-    @patch.dict(os.environ, {'GROQ_API_KEY': 'test-groq-key'})
     @patch('services.response_generator.Groq')
     def test_generate_response_with_patent_and_bis_results(self, mock_groq):
         """Test response generation with both patent and BIS search results."""
@@ -124,19 +141,15 @@ class TestResponseGenerator:
         mock_db_manager = Mock()
         
         # Mock patent results
-        patent_doc = Mock()
-        patent_doc.page_content = "Patent information content"
-        patent_doc.metadata = {'source': 'patent_doc.pdf'}
+        patent_doc = FakeDoc(page_content="Patent information content", metadata={'source': 'patent_doc.pdf'})
         
         # Mock BIS results
-        bis_doc = Mock()
-        bis_doc.page_content = "BIS standards content"
-        bis_doc.metadata = {'source': 'bis_doc.pdf'}
+        bis_doc = FakeDoc(page_content="BIS standards content", metadata={'source': 'bis_doc.pdf'})
         
-        mock_db_manager.search.side_effect = [
-            [patent_doc],  # Patent results
-            [bis_doc]      # BIS results
-        ]
+        mock_db_manager.search.side_effect = search_by_collection(
+            patent=[patent_doc],  # Patent results
+            bis=[bis_doc]         # BIS results
+        )
         
         response_gen = ResponseGenerator(mock_db_manager)
         result = response_gen.generate_response("test query")
@@ -150,9 +163,9 @@ class TestResponseGenerator:
         mock_client.chat.completions.create.assert_called_once()
         call_args = mock_client.chat.completions.create.call_args
         
-        assert call_args[1]['model'] == "deepseek-r1-distill-llama-70b"
-        assert call_args[1]['temperature'] == 0.7
-        assert call_args[1]['max_tokens'] == 500
+        assert call_args[1]['model'] == "llama-3.1-8b-instant"
+        assert call_args[1]['temperature'] == 0.2
+        assert call_args[1]['max_tokens'] == 300
         
         # Verify context was included
         messages = call_args[1]['messages']
@@ -168,7 +181,6 @@ class TestResponseGenerator:
         assert result['answer'] == "Generated response with context"
         assert result['source'] == 'patent_doc.pdf'
     
-    @patch.dict(os.environ, {'GROQ_API_KEY': 'test-groq-key'})
     @patch('services.response_generator.Groq')
     def test_generate_response_patent_only(self, mock_groq):
         """Test response generation with only patent results."""
@@ -182,14 +194,12 @@ class TestResponseGenerator:
         
         mock_db_manager = Mock()
         
-        patent_doc = Mock()
-        patent_doc.page_content = "Patent content only"
-        patent_doc.metadata = {'source': 'patent.pdf'}
+        patent_doc = FakeDoc(page_content="Patent content only", metadata={'source': 'patent.pdf'})
         
-        mock_db_manager.search.side_effect = [
-            [patent_doc],  # Patent results
-            []             # No BIS results
-        ]
+        mock_db_manager.search.side_effect = search_by_collection(
+            patent=[patent_doc],  # Patent results
+            bis=[]                # No BIS results
+        )
         
         response_gen = ResponseGenerator(mock_db_manager)
         result = response_gen.generate_response("patent query")
@@ -204,7 +214,6 @@ class TestResponseGenerator:
         assert "Patent Information:" in messages[1]['content']
         assert "BIS Information:" not in messages[1]['content']
     
-    @patch.dict(os.environ, {'GROQ_API_KEY': 'test-groq-key'})
     @patch('services.response_generator.Groq')
     def test_generate_response_bis_only(self, mock_groq):
         """Test response generation with only BIS results."""
@@ -218,14 +227,12 @@ class TestResponseGenerator:
         
         mock_db_manager = Mock()
         
-        bis_doc = Mock()
-        bis_doc.page_content = "BIS content only"
-        bis_doc.metadata = {'source': 'bis.pdf'}
+        bis_doc = FakeDoc(page_content="BIS content only", metadata={'source': 'bis.pdf'})
         
-        mock_db_manager.search.side_effect = [
-            [],            # No patent results
-            [bis_doc]      # BIS results
-        ]
+        mock_db_manager.search.side_effect = search_by_collection(
+            patent=[],            # No patent results
+            bis=[bis_doc]         # BIS results
+        )
         
         response_gen = ResponseGenerator(mock_db_manager)
         result = response_gen.generate_response("BIS query")
@@ -240,7 +247,6 @@ class TestResponseGenerator:
         assert "Patent Information:" not in messages[1]['content']
         assert "BIS Information:" in messages[1]['content']
     
-    @patch.dict(os.environ, {'GROQ_API_KEY': 'test-groq-key'})
     @patch('services.response_generator.Groq')
     def test_generate_response_no_results(self, mock_groq):
         """Test response generation with no search results."""
@@ -268,7 +274,6 @@ class TestResponseGenerator:
         context_content = messages[1]['content']
         assert "Context:\n\n" in context_content  # Empty context
     
-    @patch.dict(os.environ, {'GROQ_API_KEY': 'test-groq-key'})
     @patch('services.response_generator.Groq')
     def test_generate_response_with_custom_parameters(self, mock_groq):
         """Test response generation with custom temperature and max_tokens."""
@@ -297,7 +302,6 @@ class TestResponseGenerator:
         
         assert result['answer'] == "Custom params response"
     
-    @patch.dict(os.environ, {'GROQ_API_KEY': 'test-groq-key'})
     @patch('services.response_generator.Groq')
     def test_generate_response_groq_error(self, mock_groq):
         """Test response generation handles Groq API errors gracefully."""
@@ -316,7 +320,6 @@ class TestResponseGenerator:
         assert "I apologize, but I encountered an error" in result['answer']
         assert result['source'] is None
     
-    @patch.dict(os.environ, {'GROQ_API_KEY': 'test-groq-key'})
     @patch('services.response_generator.Groq')
     def test_generate_response_db_error(self, mock_groq):
         """Test response generation handles database search errors."""
@@ -333,7 +336,6 @@ class TestResponseGenerator:
         assert "I apologize, but I encountered an error" in result['answer']
         assert result['source'] is None
     
-    @patch.dict(os.environ, {'GROQ_API_KEY': 'test-groq-key'})
     @patch('services.response_generator.Groq')
     def test_generate_response_strips_whitespace(self, mock_groq):
         """Test that response content is properly stripped of whitespace."""
@@ -354,7 +356,6 @@ class TestResponseGenerator:
         # Verify whitespace was stripped
         assert result['answer'] == "Response with whitespace"
     
-    @patch.dict(os.environ, {'GROQ_API_KEY': 'test-groq-key'})
     @patch('services.response_generator.Groq')
     def test_multiple_documents_context_formatting(self, mock_groq):
         """Test proper formatting when multiple documents are returned."""
@@ -371,20 +372,16 @@ class TestResponseGenerator:
         # Multiple patent docs
         patent_docs = []
         for i in range(2):
-            doc = Mock()
-            doc.page_content = f"Patent content {i+1}"
-            doc.metadata = {'source': f'patent{i+1}.pdf'}
+            doc = FakeDoc(page_content=f"Patent content {i+1}", metadata={'source': f'patent{i+1}.pdf'})
             patent_docs.append(doc)
         
         # Multiple BIS docs
         bis_docs = []
         for i in range(2):
-            doc = Mock()
-            doc.page_content = f"BIS content {i+1}"
-            doc.metadata = {'source': f'bis{i+1}.pdf'}
+            doc = FakeDoc(page_content=f"BIS content {i+1}", metadata={'source': f'bis{i+1}.pdf'})
             bis_docs.append(doc)
         
-        mock_db_manager.search.side_effect = [patent_docs, bis_docs]
+        mock_db_manager.search.side_effect = search_by_collection(patent_docs, bis_docs)
         
         response_gen = ResponseGenerator(mock_db_manager)
         result = response_gen.generate_response("multi-doc query")
@@ -403,6 +400,400 @@ class TestResponseGenerator:
         # Source should be from first patent document
         assert result['source'] == 'patent1.pdf'
 
+    
+    @patch('services.response_generator.Groq')
+    def test_generate_response_truncates_context(self, mock_groq):
+        """Test retrieved context is capped at max_context_chars."""
+        mock_client = Mock()
+        mock_completion = Mock()
+        mock_completion.choices = [Mock()]
+        mock_completion.choices[0].message.content = "Short response"
+        mock_client.chat.completions.create.return_value = mock_completion
+        mock_groq.return_value = mock_client
+        
+        patent_doc = FakeDoc(page_content="x" * 500, metadata={'source': 'patent.pdf'})
+        
+        mock_db_manager = Mock()
+        mock_db_manager.search.side_effect = search_by_collection([patent_doc], [])
+        
+        response_gen = ResponseGenerator(mock_db_manager, max_context_chars=100)
+        response_gen.generate_response("long context query")
+        
+        user_content = mock_client.chat.completions.create.call_args[1]['messages'][1]['content']
+        assert user_content == "Context:\n" + ("Patent Information:\n" + "x" * 500)[:100] + "\n\nQuestion: long context query"
+    
+    @patch('services.response_generator.Groq')
+    def test_generate_response_semantic_cache_hit(self, mock_groq):
+        """Test semantically equivalent queries are answered from the cache."""
+        mock_client = Mock()
+        mock_completion = Mock()
+        mock_completion.choices = [Mock()]
+        mock_completion.choices[0].message.content = "Cached response"
+        mock_client.chat.completions.create.return_value = mock_completion
+        mock_groq.return_value = mock_client
+        
+        mock_db_manager = Mock()
+        mock_db_manager.search_vector.return_value = []
+        mock_db_manager.embed_query.side_effect = [
+            [1.0, 0.0, 0.0],   # Original query
+            [0.99, 0.05, 0.0], # Near-identical rephrasing
+            [0.0, 1.0, 0.0]    # Unrelated query
+        ]
+        
+        response_gen = ResponseGenerator(mock_db_manager)
+        first = response_gen.generate_response("What is a patent?")
+        second = response_gen.generate_response("What's a patent?")
+        
+        assert first == second
+        assert mock_client.chat.completions.create.call_count == 1
+        assert mock_db_manager.search_vector.call_count == 2  # Only the first query searched
+        mock_db_manager.search.assert_not_called()  # Both searches reuse the one embedding
+        
+        response_gen.generate_response("How long does BIS certification take?")
+        assert mock_client.chat.completions.create.call_count == 2
+
+    
+    @patch('services.response_generator.Groq')
+    def test_stream_response(self, mock_groq):
+        """Test streaming yields answer chunks and reports the source."""
+        def make_chunk(text):
+            chunk = Mock()
+            chunk.choices = [Mock()]
+            chunk.choices[0].delta.content = text
+            return chunk
+        
+        mock_client = Mock()
+        mock_client.chat.completions.create.return_value = iter([
+            make_chunk("  Patents "), make_chunk(None), make_chunk("last 20 years.")
+        ])
+        mock_groq.return_value = mock_client
+        
+        bis_doc = FakeDoc(page_content="BIS content", metadata={'source': 'bis.pdf'})
+        
+        mock_db_manager = Mock()
+        mock_db_manager.search.side_effect = search_by_collection([], [bis_doc])
+        
+        response_gen = ResponseGenerator(mock_db_manager)
+        token_stream, source = response_gen.stream_response("How long is a patent valid?")
+        
+        assert source == 'bis.pdf'
+        assert list(token_stream) == ["Patents ", "last 20 years."]
+        assert mock_client.chat.completions.create.call_args[1]['stream'] is True
+    
+    @patch('services.response_generator.Groq')
+    def test_stream_response_error(self, mock_groq):
+        """Test streaming falls back to the apology message on errors."""
+        mock_client = Mock()
+        mock_client.chat.completions.create.side_effect = Exception("Groq API Error")
+        mock_groq.return_value = mock_client
+        
+        mock_db_manager = Mock()
+        mock_db_manager.search.return_value = []
+        
+        response_gen = ResponseGenerator(mock_db_manager)
+        token_stream, source = response_gen.stream_response("test query")
+        
+        assert "I apologize, but I encountered an error" in "".join(token_stream)
+        assert source is None
+
+    
+    @patch('services.response_generator.AsyncGroq')
+    @patch('services.response_generator.Groq')
+    def test_agenerate_response_concurrent(self, mock_groq, mock_async_groq):
+        """Test async response generation can be gathered concurrently."""
+        mock_groq.return_value = Mock()
+        
+        mock_completion = Mock()
+        mock_completion.choices = [Mock()]
+        mock_completion.choices[0].message.content = "Async response"
+        mock_async_client = Mock()
+        mock_async_client.chat.completions.create = AsyncMock(return_value=mock_completion)
+        mock_async_groq.return_value = mock_async_client
+        
+        patent_doc = FakeDoc(page_content="Patent content", metadata={'source': 'patent.pdf'})
+        
+        mock_db_manager = Mock()
+        mock_db_manager.asearch = AsyncMock(return_value=[patent_doc])
+        
+        response_gen = ResponseGenerator(mock_db_manager)
+        
+        async def run():
+            return await asyncio.gather(
+                response_gen.agenerate_response("query one"),
+                response_gen.agenerate_response("query two")
+            )
+        
+        results = asyncio.run(run())
+        
+        assert [r['answer'] for r in results] == ["Async response", "Async response"]
+        assert all(r['source'] == 'patent.pdf' for r in results)
+        assert mock_async_client.chat.completions.create.await_count == 2
+        assert mock_db_manager.asearch.await_count == 4  # Patent + BIS per query
+        mock_db_manager.search.assert_not_called()
+        mock_async_groq.assert_called_once_with(api_key='test-groq-key')
+
+    
+    @patch('services.response_generator.AsyncGroq')
+    @patch('services.response_generator.Groq')
+    def test_generate_batch_realtime_twice(self, mock_groq, mock_async_groq):
+        """Test back-to-back realtime batches each get their own loop-bound primitives."""
+        mock_groq.return_value = Mock()
+        
+        mock_completion = Mock()
+        mock_completion.choices = [Mock()]
+        mock_completion.choices[0].message.content = "Batch response"
+        
+        async def slow_create(**kwargs):
+            await asyncio.sleep(0.001)  # Keep requests queued on the semaphore
+            return mock_completion
+        
+        mock_async_client = Mock()
+        mock_async_client.chat.completions.create = AsyncMock(side_effect=slow_create)
+        mock_async_client.close = AsyncMock()
+        mock_async_groq.return_value = mock_async_client
+        
+        mock_db_manager = Mock()
+        mock_db_manager.asearch = AsyncMock(return_value=[])
+        
+        response_gen = ResponseGenerator(mock_db_manager, max_concurrency=2, max_requests_per_minute=6000)
+        
+        # Distinct queries so the second batch is not answered from the cache
+        first = response_gen.generate_batch([f"first query {i}" for i in range(5)])
+        second = response_gen.generate_batch([f"second query {i}" for i in range(5)])
+        
+        assert [r['answer'] for r in first + second] == ["Batch response"] * 10
+        # A fresh client per batch loop, closed before the loop ends
+        assert mock_async_groq.call_count == 2
+        assert mock_async_client.close.await_count == 2
+
+    
+    @patch('services.response_generator.time.sleep')
+    @patch('services.response_generator.Groq')
+    def test_generate_batch_offline(self, mock_groq, mock_sleep):
+        """Test non-realtime batches go through the Groq Batch API."""
+        import json
+        
+        mock_client = Mock()
+        mock_client.files.create.return_value = Mock(id='file-in')
+        mock_client.batches.create.return_value = Mock(id='batch-1', status='in_progress')
+        mock_client.batches.retrieve.return_value = Mock(
+            id='batch-1', status='completed', output_file_id='file-out'
+        )
+        output_lines = [
+            {"custom_id": "1", "response": {"status_code": 200, "body": {
+                "choices": [{"message": {"content": " Second answer "}}]}}},
+            {"custom_id": "0", "response": None, "error": {"message": "failed"}},
+        ]
+        mock_client.files.content.return_value.read.return_value = \
+            "\n".join(json.dumps(line) for line in output_lines).encode("utf-8")
+        mock_groq.return_value = mock_client
+        
+        patent_doc = FakeDoc(page_content="Patent content", metadata={'source': 'patent.pdf'})
+        
+        mock_db_manager = Mock()
+        mock_db_manager.search.return_value = [patent_doc]
+        
+        response_gen = ResponseGenerator(mock_db_manager)
+        results = response_gen.generate_batch(["first", "second"], realtime=False, poll_interval=1)
+        
+        # Request file contains one chat completion per query
+        uploaded = mock_client.files.create.call_args[1]['file'][1].decode("utf-8").splitlines()
+        assert [json.loads(line)['custom_id'] for line in uploaded] == ["0", "1"]
+        mock_client.batches.create.assert_called_once_with(
+            completion_window="24h",
+            endpoint="/v1/chat/completions",
+            input_file_id='file-in'
+        )
+        mock_sleep.assert_called_once_with(1)
+        mock_client.chat.completions.create.assert_not_called()
+        
+        assert "I apologize, but I encountered an error" in results[0]['answer']
+        assert results[0]['source'] is None
+        assert results[1] == {"answer": "Second answer", "source": 'patent.pdf'}
+
+    
+    @patch('services.response_generator.Groq')
+    def test_instances_share_client(self, mock_groq):
+        """Test generators share one Groq client and connection pool."""
+        mock_groq.return_value = Mock()
+        
+        first = ResponseGenerator(Mock())
+        second = ResponseGenerator()
+        
+        assert first.client is second.client
+        mock_groq.assert_called_once_with(api_key='test-groq-key')
+    
+    @patch('services.response_generator.Groq')
+    def test_generate_with_supplied_context(self, mock_groq):
+        """Test generate answers from caller context and appends sources."""
+        mock_client = Mock()
+        mock_response = Mock()
+        mock_response.choices = [Mock()]
+        mock_response.choices[0].message.content = '{"has_answer": true, "answer": " Patents last 20 years. "}'
+        mock_client.chat.completions.create.return_value = mock_response
+        mock_groq.return_value = mock_client
+        
+        response_gen = ResponseGenerator(system_prompt="Answer briefly.")
+        history = [{"role": "user", "content": "Hi", "timestamp": "2024-01-01T00:00:00"}]
+        answer = response_gen.generate("Patent term is 20 years.", "How long?", history, ["patent.pdf"])
+        
+        assert answer == "Patents last 20 years.\n\nSources: patent.pdf"
+        messages = mock_client.chat.completions.create.call_args[1]['messages']
+        assert messages[0]['content'].startswith("Answer briefly.")
+        assert messages[1] == {"role": "user", "content": "Hi"}
+        assert "Patent term is 20 years." in messages[2]['content']
+        assert mock_client.chat.completions.create.call_args[1]['response_format'] == {"type": "json_object"}
+        
+        # No sources when the model has no answer
+        mock_response.choices[0].message.content = '{"has_answer": false, "answer": "I don\'t have information about this."}'
+        answer = response_gen.generate("", "Unrelated?", None, ["patent.pdf"])
+        assert answer == "I don't have information about this."
+        
+        # Plain-text replies fall back to the sentinel check
+        mock_response.choices[0].message.content = "I don't have information about this."
+        answer = response_gen.generate("", "Unrelated?", None, ["patent.pdf"])
+        assert answer == "I don't have information about this."
+
+    
+    @patch('services.response_generator._get_aiohttp_session')
+    @patch('services.response_generator.AsyncGroq')
+    @patch('services.response_generator.Groq')
+    def test_agenerate_response_fast_transport(self, mock_groq, mock_async_groq, mock_get_session):
+        """Test fast_transport posts to Groq over aiohttp instead of the SDK."""
+        mock_groq.return_value = Mock()
+        
+        mock_http_response = MagicMock()
+        mock_http_response.json = AsyncMock(return_value={
+            "choices": [{"message": {"role": "assistant", "content": " Raw response "}}]
+        })
+        mock_session = MagicMock()
+        mock_session.post.return_value.__aenter__.return_value = mock_http_response
+        mock_get_session.return_value = mock_session
+        
+        patent_doc = FakeDoc(page_content="Patent content", metadata={'source': 'patent.pdf'})
+        
+        mock_db_manager = Mock()
+        mock_db_manager.asearch = AsyncMock(return_value=[patent_doc])
+        
+        response_gen = ResponseGenerator(mock_db_manager, fast_transport=True)
+        result = asyncio.run(response_gen.agenerate_response("fast query"))
+        
+        assert result == {"answer": "Raw response", "source": 'patent.pdf'}
+        url = mock_session.post.call_args[0][0]
+        assert url == "https://api.groq.com/openai/v1/chat/completions"
+        request = mock_session.post.call_args[1]
+        assert request['headers'] == {"Authorization": "Bearer test-groq-key"}
+        assert request['json']['model'] == "llama-3.1-8b-instant"
+        mock_http_response.raise_for_status.assert_called_once()
+        mock_async_groq.assert_not_called()
+
+    
+    @patch('services.response_generator.asyncio.sleep', new_callable=AsyncMock)
+    @patch('services.response_generator.AsyncGroq')
+    @patch('services.response_generator.Groq')
+    def test_agenerate_response_retries_on_429(self, mock_groq, mock_async_groq, mock_sleep):
+        """Test rate-limited completions back off and shrink the limiter."""
+        mock_groq.return_value = Mock()
+        
+        rate_limit_error = Exception("Rate limit reached")
+        rate_limit_error.status_code = 429
+        mock_completion = Mock()
+        mock_completion.choices = [Mock()]
+        mock_completion.choices[0].message.content = "Paced response"
+        mock_async_client = Mock()
+        mock_async_client.chat.completions.create = AsyncMock(
+            side_effect=[rate_limit_error, mock_completion]
+        )
+        mock_async_groq.return_value = mock_async_client
+        
+        mock_db_manager = Mock()
+        mock_db_manager.asearch = AsyncMock(return_value=[])
+        
+        response_gen = ResponseGenerator(
+            mock_db_manager, max_requests_per_minute=600, max_tokens_per_minute=100000
+        )
+        result = asyncio.run(response_gen.agenerate_response("busy query"))
+        
+        assert result['answer'] == "Paced response"
+        assert mock_async_client.chat.completions.create.await_count == 2
+        mock_sleep.assert_awaited_once()
+        # Halved on the 429, then grown by 10% after the success
+        assert response_gen.rate_limiter._scale == pytest.approx(0.55)
+
+    
+    @patch('services.response_generator.Groq')
+    def test_generate_response_fits_context_window(self, mock_groq):
+        """Test context is cut to what the context window leaves after the prompt."""
+        mock_client = Mock()
+        mock_completion = Mock()
+        mock_completion.choices = [Mock()]
+        mock_completion.choices[0].message.content = "Short response"
+        mock_client.chat.completions.create.return_value = mock_completion
+        mock_groq.return_value = mock_client
+        
+        patent_doc = FakeDoc(page_content="x" * 500, metadata={'source': 'patent.pdf'})
+        
+        mock_db_manager = Mock()
+        mock_db_manager.search.side_effect = search_by_collection([patent_doc], [])
+        
+        response_gen = ResponseGenerator(mock_db_manager, context_window=600)
+        response_gen.generate_response("long query")
+        
+        # 600 - 36 (system prompt) - 300 (max_tokens) - 3 (query) - 200 (overhead) = 61 tokens
+        user_content = mock_client.chat.completions.create.call_args[1]['messages'][1]['content']
+        assert user_content == "Context:\n" + ("Patent Information:\n" + "x" * 500)[:244] + "\n\nQuestion: long query"
+
+    
+    @patch('services.response_generator.Groq')
+    def test_generate_response_cached(self, mock_groq):
+        """Test identical repeated questions skip embedding, retrieval and Groq."""
+        mock_client = Mock()
+        mock_completion = Mock()
+        mock_completion.choices = [Mock()]
+        mock_completion.choices[0].message.content = "Cached answer"
+        mock_client.chat.completions.create.return_value = mock_completion
+        mock_groq.return_value = mock_client
+        
+        mock_db_manager = Mock()
+        mock_db_manager.search.return_value = []
+        mock_db_manager.embed_query.return_value = []
+        
+        response_gen = ResponseGenerator(mock_db_manager)
+        first = response_gen.generate_response("What is a patent?")
+        second = response_gen.generate_response("  what is a PATENT? ")
+        
+        assert first == second == {"answer": "Cached answer", "source": None}
+        assert mock_client.chat.completions.create.call_count == 1
+        assert mock_db_manager.embed_query.call_count == 1
+        
+        # Different generation settings are cached separately
+        response_gen.generate_response("What is a patent?", temperature=0.9)
+        assert mock_client.chat.completions.create.call_count == 2
+        
+        response_gen.clear_response_cache()
+        response_gen.generate_response("What is a patent?")
+        assert mock_client.chat.completions.create.call_count == 3
+
+
+class TestSemanticCache:
+    """Test cases for the SemanticCache ring buffer."""
+    
+    def test_full_cache_evicts_least_recently_hit(self):
+        """Test a store into a full cache replaces the entry hit longest ago."""
+        from services.semantic_cache import SemanticCache
+        
+        cache = SemanticCache(threshold=0.99, max_entries=2)
+        cache.put([1.0, 0.0, 0.0], "first")
+        cache.put([0.0, 1.0, 0.0], "second")
+        assert cache.get([1.0, 0.0, 0.0]) == "first"  # Now more recent than "second"
+        
+        cache.put([0.0, 0.0, 1.0], "third")
+        
+        assert len(cache) == 2
+        assert cache.get([1.0, 0.0, 0.0]) == "first"
+        assert cache.get([0.0, 1.0, 0.0]) is None
+        assert cache.get([0.0, 0.0, 1.0]) == "third"
+
 
 if __name__ == "__main__":
     # Run tests with: python -m pytest test_response_generator.py -v
@@ -1,60 +1,143 @@
-from typing import List, Dict, Optional
+import atexit
+import weakref
+from collections import deque
+from typing import Deque, List, Dict, Optional
 import json
-import os
+import time
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
+
+
+def _dump_line(message: Dict) -> bytes:
+    """Serialize one message as a compact JSONL line."""
+    if orjson is not None:
+        return orjson.dumps(message) + b"\n"
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _load_line(line: bytes) -> Dict:
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+
+# Histories with possibly unwritten messages, flushed at interpreter exit
+_open_histories = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_open_histories() -> None:
+    for history in list(_open_histories):
+        history.flush()
+
+
 class ChatHistory:
-    def __init__(self, max_history: int = 10):
-        self.history: List[Dict] = []
+    def __init__(self, max_history: int = 10, flush_every: int = 5):
+        # Bounded ring buffer: appending past max_history drops the oldest message
+        self.history: Deque[Dict] = deque(maxlen=max_history)
         self.max_history = max_history
-        self.history_file = "chat_history.json"
+        # One JSON object per line, so new messages are appended instead of rewriting the file
+        self.history_file = "chat_history.jsonl"
+        self.legacy_history_file = "chat_history.json"
+        self._file_lines = 0
+        # Messages not yet written; flushed at the end of each assistant turn or every flush_every messages
+        self.flush_every = flush_every
+        self._pending: List[Dict] = []
         self._load_history()
+        _open_histories.add(self)
 
     def add_message(self, role: str, content: str, source: Optional[str] = None) -> None:
         """Add a message to the chat history."""
         message = {
             "role": role,
             "content": content,
-            "timestamp": datetime.now().isoformat()
+            # Nanoseconds since the epoch; formatted as ISO only when read
+            "timestamp": time.time_ns()
         }
         if source:
             message["source"] = source
             
         self.history.append(message)
+        self._pending.append(message)
         
-        # Keep only the last max_history messages
-        if len(self.history) > self.max_history:
-            self.history = self.history[-self.max_history:]
-        
-        self._save_history()
+        if role == "assistant" or len(self._pending) >= self.flush_every:
+            self.flush()
 
     def get_history(self) -> List[Dict]:
-        """Get the current chat history."""
-        return self.history
+        """Get the current chat history, with ISO-formatted timestamps."""
+        return [
+            {**message, "timestamp": self._format_timestamp(message["timestamp"])}
+            if isinstance(message.get("timestamp"), int) else message
+            for message in self.history
+        ]
+
+    @staticmethod
+    def _format_timestamp(ns: int) -> str:
+        seconds, remainder = divmod(ns, 1_000_000_000)
+        return datetime.fromtimestamp(seconds).replace(microsecond=remainder // 1000).isoformat()
 
     def clear(self) -> None:
         """Clear the chat history."""
-        self.history = []
+        self.history.clear()
         self._save_history()
 
     def save(self) -> None:
         """Save the current chat history."""
-        self._save_history()
+        self.flush()
+
+    def flush(self) -> None:
+        """Append pending messages to the history file, compacting it when it grows too long."""
+        if not self._pending:
+            return
+        
+        # Trimmed messages stay in the file until it holds twice max_history
+        # lines, so the full rewrite happens once per max_history appends
+        if self._file_lines + len(self._pending) > 2 * self.max_history:
+            self._save_history()
+            return
+        
+        try:
+            with open(self.history_file, 'ab') as f:
+                f.write(b"".join(_dump_line(message) for message in self._pending))
+            self._file_lines += len(self._pending)
+            self._pending = []
+        except Exception as e:
+            print(f"Error saving chat history: {e}")
 
     def _save_history(self) -> None:
-        """Save chat history to file."""
+        """Rewrite the history file with the current chat history."""
         try:
-            with open(self.history_file, 'w') as f:
-                json.dump(self.history, f, indent=2)
+            with open(self.history_file, 'wb') as f:
+                f.write(b"".join(_dump_line(message) for message in self.history))
+            self._file_lines = len(self.history)
+            self._pending = []
         except Exception as e:
             print(f"Error saving chat history: {e}")
 
     def _load_history(self) -> None:
         """Load chat history from file if it exists."""
         try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r') as f:
-                    self.history = json.load(f)
+            with open(self.history_file, 'rb') as f:
+                lines = [line for line in f if line.strip()]
+            self._file_lines = len(lines)
+            self.history.extend(_load_line(line) for line in lines[-self.max_history:])
+        except FileNotFoundError:
+            self._load_legacy_history()
+        except Exception as e:
+            print(f"Error loading chat history: {e}")
+            self.history.clear()
+
+    def _load_legacy_history(self) -> None:
+        """Load history written by older versions as a single JSON array."""
+        try:
+            with open(self.legacy_history_file, 'rb') as f:
+                self.history.extend(_load_line(f.read()))
+            # Carry the old messages over into the JSONL file on the next flush
+            self._pending.extend(self.history)
+        except FileNotFoundError:
+            pass
         except Exception as e:
             print(f"Error loading chat history: {e}")
-            self.history = []
+            self.history.clear()
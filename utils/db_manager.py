@@ -13,19 +13,53 @@ Required environment variables:
 - PINECONE_ENV: Pinecone environment (e.g., us-east-1-aws)
 - PINECONE_INDEX_NAME: Name of the Pinecone index
 - GROQ_API_KEY: Groq API key for embeddings (optional, falls back to sentence-transformers)
+- REDIS_URL: Redis instance shared as an L2 embedding cache (optional)
+- EMBEDDING_CACHE_PATH: SQLite file persisting embeddings across restarts (optional)
 """
 
 import os
 import json
-from typing import List, Dict, Any
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Dict, Any, Optional, Iterable, Iterator
 from dotenv import load_dotenv
 import streamlit as st
-from pinecone import Pinecone, ServerlessSpec
+from pinecone import ServerlessSpec
+try:
+    # Binary protobuf transport over HTTP/2; needs the pinecone[grpc] extra
+    from pinecone.grpc import PineconeGRPC as Pinecone
+except ImportError:
+    from pinecone import Pinecone
 import time
-from .embedder import get_embedder
+import numpy as np
+from .embedder import get_embedder, contextual_text
+from .embed_cache import EmbeddingDiskCache
+from .embed_pipeline import EmbeddingBatcher
+from .query_cache import QueryCache
+from .redis_cache import RedisCache, EMBEDDING_TTL
+from services.rate_limiter import is_rate_limited
 
 load_dotenv()
 
+# Maximum number of texts whose embeddings are kept in the LRU cache
+EMBEDDING_CACHE_SIZE = 1024
+# Vectors sent per Pinecone upsert request
+UPSERT_BATCH_SIZE = 100
+# Retries for an upsert batch rejected with HTTP 429
+UPSERT_MAX_RETRIES = 5
+# Seconds to wait for a newly created index to become ready
+INDEX_READY_TIMEOUT = 60
+# Upsert batches in flight at once; Pinecone throughput stops improving past a few
+UPSERT_CONCURRENCY = 4
+
+# Threads that async callers block on embeddings with; the model already uses
+# every core per forward pass, so more would only oversubscribe the CPU
+_embed_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="embed")
+
 class VectorDBManager:
     def __init__(self):
         # Initialize embedder for generating embeddings
@@ -45,7 +79,17 @@ class VectorDBManager:
         
         # Initialize or connect to index with appropriate dimension
         self.index = self._initialize_index()
-        self.embeddings_cache = {}
+        self.embeddings_cache = OrderedDict()
+        # Sessions, the embed pool and search threads all share the LRU
+        self._embeddings_cache_lock = threading.Lock()
+        # Survives restarts on this machine; disabled without EMBEDDING_CACHE_PATH
+        self.disk_cache = EmbeddingDiskCache()
+        # Recent search results per collection, invalidated when it changes
+        self.query_cache = QueryCache()
+        # Merges concurrent single-query embeddings from different sessions
+        self._query_batcher = EmbeddingBatcher(lambda texts: self.embedder.generate(texts))
+        # Shared across replicas and restarts; disabled without REDIS_URL
+        self.l2_cache = RedisCache()
     
     def _initialize_index(self):
         """Initialize or connect to a Pinecone index."""
@@ -67,8 +111,7 @@ class VectorDBManager:
                         region='us-east-1'
                     )
                 )
-                # Allow some time for index creation
-                time.sleep(10)  # Increase wait time for cloud deployment
+                self._wait_until_ready()
             else:
                 print(f"Using existing Pinecone index '{self.index_name}'")
                 
@@ -77,6 +120,17 @@ class VectorDBManager:
             print(f"Error initializing Pinecone index: {str(e)}")
             raise
 
+    def _wait_until_ready(self):
+        """Poll a newly created index until Pinecone reports it ready."""
+        start = time.monotonic()
+        attempt = 0
+        while not self.pc.describe_index(self.index_name).status['ready']:
+            if time.monotonic() - start > INDEX_READY_TIMEOUT:
+                raise TimeoutError(f"Pinecone index '{self.index_name}' not ready after {INDEX_READY_TIMEOUT}s")
+            time.sleep(min(0.5 * 2 ** attempt, 1.0))
+            attempt += 1
+        print(f"Pinecone index '{self.index_name}' ready after {time.monotonic() - start:.1f}s")
+
     def create_collection(self, name: str):
         """Create a new collection (namespace in Pinecone)."""
         # In Pinecone, namespaces are created implicitly when data is upserted
@@ -85,46 +139,185 @@ class VectorDBManager:
             self._namespaces = set()
         self._namespaces.add(name)
 
-    def upsert_embeddings(self, namespace: str, documents: List[Dict[str, Any]]):
-        """Upsert embeddings to the Pinecone index."""
+    def upsert_embeddings(self, namespace: str, documents: Iterable[Dict[str, Any]],
+                          skip_unchanged: bool = True):
+        """
+        Upsert embeddings to the Pinecone index.
+        
+        Documents may be any iterable, including a generator, and are
+        processed as a pipeline of UPSERT_BATCH_SIZE windows: each window
+        is embedded in one batched embedder call and handed to a worker
+        for upserting while the next window is embedded. At most
+        UPSERT_CONCURRENCY windows are held in memory at a time, however
+        many documents there are.
+        
+        Documents may carry a precomputed vector (list or float32 ndarray)
+        under the 'embedding' key; those are not re-embedded.
+        
+        Each vector stores a hash of its chunk text and of the embedding
+        model (see EmbedderManager.get_model_signature) as 'chunk_hash', and
+        chunks whose stored hash still matches are skipped entirely, so
+        re-indexing an edited document only embeds the chunks that changed,
+        while switching the model or backend re-embeds everything. Pass
+        skip_unchanged=False when the caller already filtered the
+        documents with changed_documents().
+        """
         try:
-            vectors = []
-            for i, doc in enumerate(documents):
-                # Get embedding
-                embedding = self._get_embedding(doc['page_content'])
-                if embedding:
-                    # Create unique ID using namespace and chunk info
-                    # Handle both Windows and Unix path separators
-                    source_filename = os.path.basename(doc['metadata']['source'])
-                    doc_id = f"{namespace}_{source_filename}_{doc['metadata']['chunk_id']}"
-                    # Include metadata in the vector
-                    vectors.append({
-                        'id': doc_id,
-                        'values': embedding,
-                        'metadata': {
-                            'page_content': doc['page_content'][:40000],  # Limit metadata size
-                            'source': doc['metadata']['source'],
-                            'chunk_id': str(doc['metadata']['chunk_id'])
-                        }
-                    })
-            
-            if vectors:
-                # Upsert in batches for better performance
-                batch_size = 100
-                for i in range(0, len(vectors), batch_size):
-                    batch = vectors[i:i + batch_size]
-                    self.index.upsert(vectors=batch, namespace=namespace)
-                    time.sleep(0.1)  # Small delay between batches
+            with ThreadPoolExecutor(max_workers=UPSERT_CONCURRENCY,
+                                    thread_name_prefix="pinecone-upsert") as executor:
+                in_flight = deque()
+                for window in self._iter_windows(documents, UPSERT_BATCH_SIZE):
+                    vectors = self._build_vectors(namespace, window, skip_unchanged)
+                    if not vectors:
+                        continue
+                    if len(in_flight) >= UPSERT_CONCURRENCY:
+                        in_flight.popleft().result()  # Re-raise a failed batch early
+                    in_flight.append(executor.submit(self._upsert_batch, vectors, namespace))
+                for future in in_flight:
+                    future.result()
         except Exception as e:
             print(f"Error upserting embeddings: {str(e)}")
             raise
+        finally:
+            # Even a partially applied upsert changes what searches return
+            self.query_cache.invalidate(namespace)
+    
+    @staticmethod
+    def _iter_windows(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+        """Yield consecutive lists of up to `size` items."""
+        iterator = iter(items)
+        while True:
+            window = list(islice(iterator, size))
+            if not window:
+                return
+            yield window
+    
+    def _build_vectors(self, namespace: str, documents: List[Dict[str, Any]],
+                       skip_unchanged: bool = True) -> List[Dict[str, Any]]:
+        """Embed the changed documents of a window and build their Pinecone vector records."""
+        if skip_unchanged:
+            documents = self.changed_documents(namespace, documents)
+        
+        embeddings = self._embed_documents(documents)
+        
+        vectors = []
+        for doc, embedding in zip(documents, embeddings):
+            if embedding is not None and len(embedding):
+                # Include metadata in the vector
+                vectors.append({
+                    'id': self._vector_id(namespace, doc),
+                    'values': embedding,
+                    'metadata': {
+                        'page_content': doc['page_content'][:40000],  # Limit metadata size
+                        'source': doc['metadata']['source'],
+                        'chunk_id': str(doc['metadata']['chunk_id']),
+                        'chunk_hash': self._chunk_hash(contextual_text(doc))
+                    }
+                })
+        return vectors
+    
+    def changed_documents(self, namespace: str, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Drop the documents already indexed with the same content and embedding model.
+        
+        Lets a caller that embeds documents itself (such as the migration
+        script) skip unchanged chunks before paying for their embeddings.
+        """
+        if not documents:
+            return []
+        ids = [self._vector_id(namespace, doc) for doc in documents]
+        existing = self._fetch_chunk_hashes(namespace, ids)
+        changed = [doc for doc_id, doc in zip(ids, documents)
+                   if existing.get(doc_id) != self._chunk_hash(contextual_text(doc))]
+        if len(changed) < len(documents):
+            print(f"Skipping {len(documents) - len(changed)} unchanged chunks")
+        return changed
+    
+    @staticmethod
+    def _vector_id(namespace: str, doc: Dict[str, Any]) -> str:
+        # Handle both Windows and Unix path separators
+        return f"{namespace}_{os.path.basename(doc['metadata']['source'])}_{doc['metadata']['chunk_id']}"
+    
+    def _chunk_hash(self, text: str) -> str:
+        """Short hash of a chunk's text and the model embedding it, identifying an unchanged chunk."""
+        tagged = f"{self.embedder.get_model_signature()}\x1f{text}"
+        return hashlib.blake2b(tagged.encode('utf-8'), digest_size=8).hexdigest()
+    
+    def _fetch_chunk_hashes(self, namespace: str, ids: List[str]) -> Dict[str, str]:
+        """Map already indexed IDs to their stored chunk_hash; empty if the fetch fails."""
+        try:
+            response = self.index.fetch(ids=ids, namespace=namespace)
+        except Exception as e:
+            print(f"Error fetching existing chunks, re-embedding all: {str(e)}")
+            return {}
+        
+        vectors = response.get('vectors') if isinstance(response, dict) else getattr(response, 'vectors', None)
+        if not isinstance(vectors, dict):
+            return {}
+        
+        hashes = {}
+        for doc_id, vector in vectors.items():
+            metadata = vector.get('metadata') if isinstance(vector, dict) else getattr(vector, 'metadata', None)
+            if metadata and metadata.get('chunk_hash'):
+                hashes[doc_id] = metadata['chunk_hash']
+        return hashes
+    
+    def _embed_documents(self, documents: List[Dict[str, Any]]) -> List[Optional[np.ndarray]]:
+        """
+        Return one embedding per document (None for empty content).
+        
+        Precomputed 'embedding' values are reused; everything else is sent
+        to the embedder in one call so it runs at full batch size. Chunks
+        are embedded with their source context (see contextual_text).
+        """
+        embeddings = [doc.get('embedding') for doc in documents]
+        pending = [i for i, embedding in enumerate(embeddings)
+                   if embedding is None and documents[i]['page_content'].strip()]
+        if pending:
+            generated = self._get_embeddings_bulk([contextual_text(documents[i]) for i in pending])
+            for i, embedding in zip(pending, generated):
+                embeddings[i] = embedding
+        return embeddings
+    
+    def _upsert_batch(self, batch: List[Dict[str, Any]], namespace: str):
+        """Upsert one batch, backing off exponentially only when rate limited."""
+        # NumPy vectors are only converted to Python lists here,
+        # one batch at a time, right before serialization
+        for vector in batch:
+            if isinstance(vector['values'], np.ndarray):
+                vector['values'] = vector['values'].tolist()
+        
+        for attempt in range(UPSERT_MAX_RETRIES + 1):
+            try:
+                return self.index.upsert(vectors=batch, namespace=namespace)
+            except Exception as e:
+                if attempt == UPSERT_MAX_RETRIES or not is_rate_limited(e):
+                    raise
+                delay = min(0.5 * 2 ** attempt, 30)
+                print(f"Pinecone rate limit hit, retrying in {delay:.1f}s...")
+                time.sleep(delay)
 
-    def query_embeddings(self, namespace: str, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Query Pinecone for documents similar to the query."""
-        query_embedding = self._get_embedding(query)
-        if not query_embedding:
+    def query_embeddings(self, namespace: str, query: str, top_k: int = 5,
+                         query_vector: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+        """
+        Query Pinecone for documents similar to the query.
+        
+        Pass query_vector to reuse an embedding the caller already computed.
+        Results are served from the query cache for up to QUERY_CACHE_TTL
+        seconds, until the namespace is next modified.
+        """
+        query_embedding = query_vector if query_vector is not None else self.embed_query(query)
+        if not len(query_embedding):
             return []
         
+        cache_key = self.query_cache.key(namespace, query_embedding, top_k)
+        cached = self.query_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        if isinstance(query_embedding, np.ndarray):
+            query_embedding = query_embedding.tolist()
+        
         try:
             results = self.index.query(
                 vector=query_embedding,
@@ -144,6 +337,7 @@ class VectorDBManager:
                     },
                     'score': match['score']
                 })
+            self.query_cache.put(cache_key, documents)
             return documents
         except Exception as e:
             print(f"Error querying Pinecone: {str(e)}")
@@ -156,93 +350,255 @@ class VectorDBManager:
         except Exception as e:
             print(f"Error deleting namespace {namespace}: {str(e)}")
             raise
+        finally:
+            self.query_cache.invalidate(namespace)
     
     def load_pdf(self, file_path: str) -> List[Dict[str, Any]]:
         """Load and process a PDF file."""
         try:
+            return list(self.iter_pdf_documents(file_path))
+        except Exception as e:
+            print(f"Error loading PDF: {str(e)}")
+            return []
+    
+    def iter_pdf_documents(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        """Yield a PDF's chunk documents one at a time, reading pages lazily."""
+        for i, chunk in enumerate(self._iter_chunks(self._iter_pdf_pages(file_path))):
+            yield {
+                'page_content': chunk,
+                'metadata': {
+                    'source': file_path,
+                    'chunk_id': i
+                }
+            }
+    
+    @staticmethod
+    def _iter_pdf_pages(file_path: str) -> Iterator[str]:
+        """
+        Yield the text of each PDF page.
+        
+        Uses PDFium (pypdfium2) when installed, which extracts text several
+        times faster than PyPDF2, and falls back to PyPDF2 otherwise or if
+        PDFium cannot open the file.
+        """
+        try:
+            import pypdfium2 as pdfium
+            pdf = pdfium.PdfDocument(file_path)
+        except Exception:
+            pdf = None
+        
+        if pdf is None:
             import PyPDF2
             
-            content = ""
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
-                for page_num, page in enumerate(pdf_reader.pages):
-                    content += page.extract_text() + "\n"
-            
-            # Split content into chunks
-            chunks = self._split_text(content)
-            
-            # Create documents with metadata
-            documents = []
-            for i, chunk in enumerate(chunks):
-                documents.append({
-                    'page_content': chunk,
-                    'metadata': {
-                        'source': file_path,
-                        'chunk_id': i
-                    }
-                })
-            
-            return documents
-        except Exception as e:
-            print(f"Error loading PDF: {str(e)}")
-            return []
+                for page in pdf_reader.pages:
+                    yield page.extract_text() or ""
+            return
+        
+        # PDFium is not thread-safe, so pages are extracted one at a time
+        try:
+            for page in pdf:
+                textpage = page.get_textpage()
+                yield textpage.get_text_range()
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
     
     def _split_text(self, text: str, chunk_size: int = 1000) -> List[str]:
         """Split text into chunks."""
-        words = text.split()
-        chunks = []
-        current_chunk = []
-        current_size = 0
-        
-        for word in words:
-            current_chunk.append(word)
-            current_size += len(word) + 1
-            
-            if current_size >= chunk_size:
-                chunks.append(' '.join(current_chunk))
-                current_chunk = []
-                current_size = 0
+        return list(self._iter_chunks([text], chunk_size))
+    
+    @staticmethod
+    def _iter_chunks(texts: Iterable[str], chunk_size: int = 1000) -> Iterator[str]:
+        """
+        Yield chunks of roughly chunk_size characters from a stream of texts.
         
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
+        A chunk ends at the first word that brings its size (words plus one
+        separator each) to chunk_size. Words run on across text boundaries,
+        so chunking a document page by page gives the same chunks as
+        chunking its joined text.
+        """
+        # With whitespace collapsed to single spaces, a chunk ends at the
+        # first space at least chunk_size - 1 characters after its start,
+        # so boundaries are found with str.find rather than a per-word loop
+        reach = max(chunk_size - 1, 0)
+        carry = ''
+        for text in texts:
+            normalized = ' '.join(text.split())
+            if not normalized:
+                continue
+            if carry:
+                normalized = f"{carry} {normalized}"
+            
+            start = 0
+            while True:
+                end = normalized.find(' ', start + reach)
+                if end == -1:
+                    break
+                yield normalized[start:end]
+                start = end + 1
+            
+            carry = normalized[start:]
+            if len(carry) >= reach:
+                yield carry
+                carry = ''
         
-        return chunks
+        if carry:
+            yield carry
     
-    def _get_embedding(self, text: str) -> List[float]:
-        """Get embedding for text using the new embedder."""
-        if text in self.embeddings_cache:
-            return self.embeddings_cache[text]
-        
+    def _get_embedding(self, text: str) -> np.ndarray:
+        """Get the embedding for one text, or an empty array if it cannot be generated."""
         try:
-            # Use the new embedder to generate embeddings
-            embeddings = self.embedder.generate([text])
-            if embeddings and len(embeddings) > 0:
-                embedding = embeddings[0]  # Get the first (and only) embedding
-                self.embeddings_cache[text] = embedding
-                return embedding
-            else:
-                print(f"No embedding generated for text: {text[:50]}...")
-                return []
+            return self._get_embeddings_bulk([text], coalesce=True)[0]
         except Exception as e:
             print(f"Error getting embedding: {str(e)}")
-            return []
+            return np.empty(0, dtype=np.float32)
+    
+    def _get_embeddings_bulk(self, texts: List[str], coalesce: bool = False) -> List[np.ndarray]:
+        """
+        Get float32 embeddings for several texts, aligned with the input.
+        
+        Vectors stay NumPy arrays end to end and are only converted to
+        lists when a Pinecone request is serialized; freshly generated
+        vectors are rows of one contiguous matrix. Every position gets an
+        array of its own that the caller may modify, even when a text
+        appears more than once or was read from a persistent tier.
+        
+        The cache is a bounded LRU of float32 vectors (about 1.5 MB at
+        1024 MiniLM entries; see utils/embed_cache.py for why no tier is
+        stored at reduced precision). Misses are looked up in the
+        on-disk cache and then the shared Redis cache (each if configured,
+        in one round trip), and whatever is still missing is embedded in a
+        single batched embedder call. With coalesce, that call goes through
+        the query batcher and may be shared with concurrent callers.
+        """
+        embeddings: List[Optional[np.ndarray]] = [None] * len(texts)
+        # Distinct uncached text -> positions it fills in the result
+        misses: Dict[str, List[int]] = {}
+        with self._embeddings_cache_lock:
+            for i, text in enumerate(texts):
+                cached = self.embeddings_cache.get(text)
+                if cached is not None:
+                    self.embeddings_cache.move_to_end(text)
+                    embeddings[i] = cached.copy()
+                else:
+                    misses.setdefault(text, []).append(i)
+        if not misses:
+            return embeddings
+        
+        # Persistent tiers outlive the process, so they are keyed on the
+        # backend and dimension as well as the provider
+        model = self.embedder.get_model_signature()
+        for text, cached in zip(list(misses), self.disk_cache.get_many(list(misses), model)):
+            if cached is not None:
+                self._cache_embedding(text, cached)
+                for i in misses.pop(text):
+                    embeddings[i] = cached.copy()  # Read-only view of the SQLite row
+        if not misses:
+            return embeddings
+        
+        # Fall back to the shared Redis cache before computing
+        l2_keys = {text: self.l2_cache.key("emb", model, text) for text in misses}
+        l2_hits = {}
+        for text, cached in zip(list(misses), self.l2_cache.get_vectors(list(l2_keys.values()))):
+            if cached is not None:
+                self._cache_embedding(text, cached)
+                vector = l2_hits[text] = np.asarray(cached, dtype=np.float32)
+                for i in misses.pop(text):
+                    embeddings[i] = vector.copy()  # Read-only view of the Redis payload
+        self.disk_cache.put_many(l2_hits, model)
+        if not misses:
+            return embeddings
+        
+        generate = self._query_batcher.embed if coalesce else self.embedder.generate
+        generated = np.asarray(generate(list(misses)), dtype=np.float32)
+        if len(generated) != len(misses):
+            raise RuntimeError(f"Expected {len(misses)} embeddings, got {len(generated)}")
+        
+        new_vectors = {}
+        for (text, positions), embedding in zip(misses.items(), generated):
+            self._cache_embedding(text, embedding)
+            new_vectors[text] = embedding
+            embeddings[positions[0]] = embedding
+            for i in positions[1:]:
+                embeddings[i] = embedding.copy()
+        self.disk_cache.put_many(new_vectors, model)
+        self.l2_cache.set_vectors({l2_keys[text]: vector for text, vector in new_vectors.items()}, EMBEDDING_TTL)
+        return embeddings
     
-    def index_document(self, collection: str, documents: List[Dict[str, Any]], metadata: Dict[str, Any] = None):
-        """Index documents in a collection (namespace in Pinecone)."""
+    def _cache_embedding(self, text: str, embedding):
+        """Add an embedding to the in-process LRU, evicting the oldest entry."""
+        # A copy, so a cached row does not keep its whole batch matrix alive
+        vector = np.array(embedding, dtype=np.float32)
+        with self._embeddings_cache_lock:
+            self.embeddings_cache[text] = vector
+            self.embeddings_cache.move_to_end(text)
+            if len(self.embeddings_cache) > EMBEDDING_CACHE_SIZE:
+                self.embeddings_cache.popitem(last=False)  # Evict least recently used
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a query string, reusing the embedding cache."""
+        return self._get_embedding(self._normalize_query(query))
+    
+    def _normalize_query(self, query: str) -> str:
+        """
+        Canonical form of a query for the embedding caches.
+        
+        all-MiniLM-L6-v2 uses an uncased tokenizer that also splits on any
+        run of whitespace, so case and spacing variants embed identically
+        and can share one cache entry.
+        """
+        if self.embedder.provider != "sentence_transformers":
+            return query
+        return " ".join(query.lower().split())
+    
+    def index_document(self, collection: str, documents: Iterable[Dict[str, Any]], metadata: Dict[str, Any] = None):
+        """Index documents (a list or any iterable) in a collection (namespace in Pinecone)."""
         self.create_collection(collection)
         
         # Update documents with additional metadata if provided
         if metadata:
-            for doc in documents:
-                doc['metadata'].update(metadata)
+            documents = self._with_metadata(documents, metadata)
         
         # Use the new upsert_embeddings method
         self.upsert_embeddings(collection, documents)
     
-    def search(self, collection: str, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _with_metadata(documents: Iterable[Dict[str, Any]], metadata: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        for doc in documents:
+            doc['metadata'].update(metadata)
+            yield doc
+    
+    def index_pdf(self, collection: str, file_path: str, metadata: Dict[str, Any] = None):
+        """
+        Stream a PDF into a collection: split, embed and upsert window by
+        window, so memory stays bounded regardless of the PDF's size.
+        """
+        self.index_document(collection, self.iter_pdf_documents(file_path), metadata)
+    
+    def search(self, collection: str, query: str, limit: int = 5,
+               query_vector: Optional[List[float]] = None) -> List[Dict[str, Any]]:
         """Search for similar documents in a collection (namespace in Pinecone)."""
         # Use the new query_embeddings method
-        return self.query_embeddings(collection, query, limit)
+        return self.query_embeddings(collection, query, limit, query_vector=query_vector)
+    
+    def search_vector(self, collection: str, vector: List[float], limit: int = 5) -> List[Dict[str, Any]]:
+        """Search a collection with a precomputed query embedding."""
+        return self.query_embeddings(collection, "", limit, query_vector=vector)
+    
+    async def aembed_query(self, query: str) -> np.ndarray:
+        """Async embed_query; the model runs on the embedding pool, off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_embed_pool, self.embed_query, query)
+    
+    async def asearch(self, collection: str, query: str, limit: int = 5,
+                      query_vector: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+        """Async search; embeds on the embedding pool and runs the blocking Pinecone query in a worker thread."""
+        if query_vector is None:
+            query_vector = await self.aembed_query(query)
+        return await asyncio.to_thread(self.search, collection, query, limit, query_vector)
     
     # Cosine similarity no longer needed as Pinecone handles similarity computation
     
@@ -0,0 +1,110 @@
+"""
+Persistent on-disk embedding cache.
+
+Keeps embeddings in a local SQLite file so a restarted process does not
+re-embed text it has already seen. Entries are content-addressed by a
+BLAKE2b hash of the model and the text. The cache is optional: without
+EMBEDDING_CACHE_PATH every lookup misses and every store is a no-op.
+
+Vectors are stored as float32, like the in-process and Redis tiers. A
+float16 store would halve the file, but cache hits are upserted to
+Pinecone and key the search cache, so a text would index differently
+depending on which tier served it; the vectors are small enough that the
+savings are not worth that.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+import streamlit as st
+
+load_dotenv()
+
+# SQLite caps the number of bound parameters per statement
+_SQLITE_MAX_PARAMS = 900
+
+
+class EmbeddingDiskCache:
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None):
+        # Seconds an entry stays valid; None keeps entries until the model changes
+        self.ttl = ttl
+        self.conn = None
+        self._lock = threading.Lock()
+
+        path = path or st.secrets.get("EMBEDDING_CACHE_PATH", os.getenv('EMBEDDING_CACHE_PATH'))
+        if not path:
+            return
+
+        try:
+            # Shared by Streamlit's script threads; access is serialized by the lock
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key BLOB PRIMARY KEY, vector BLOB NOT NULL, created REAL NOT NULL)"
+            )
+            self.conn.commit()
+        except Exception as e:
+            print(f"Embedding disk cache disabled: {str(e)}")
+            self.conn = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.conn is not None
+
+    @staticmethod
+    def key(model: str, text: str) -> bytes:
+        """Content address of a text under a given model."""
+        return hashlib.blake2b(f"{model}\x1f{text}".encode("utf-8"), digest_size=16).digest()
+
+    def get_many(self, texts: List[str], model: str) -> List[Optional[np.ndarray]]:
+        """Return a float32 vector per text, or None for misses and expired entries."""
+        if self.conn is None or not texts:
+            return [None] * len(texts)
+
+        keys = [self.key(model, text) for text in texts]
+        found = {}
+        try:
+            with self._lock:
+                for start in range(0, len(keys), _SQLITE_MAX_PARAMS):
+                    chunk = keys[start:start + _SQLITE_MAX_PARAMS]
+                    rows = self.conn.execute(
+                        f"SELECT key, vector, created FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk
+                    )
+                    found.update((key, (vector, created)) for key, vector, created in rows)
+        except Exception as e:
+            print(f"Error reading embedding disk cache: {str(e)}")
+            return [None] * len(texts)
+
+        now = time.time()
+        vectors = []
+        for key in keys:
+            row = found.get(key)
+            if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                vectors.append(None)
+            else:
+                vectors.append(np.frombuffer(row[0], dtype=np.float32))
+        return vectors
+
+    def put_many(self, embeddings: Dict[str, np.ndarray], model: str):
+        """Store text -> vector pairs in one transaction; failures are logged and ignored."""
+        if self.conn is None or not embeddings:
+            return
+
+        now = time.time()
+        rows = [(self.key(model, text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+                for text, vector in embeddings.items()]
+        try:
+            with self._lock, self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, created) VALUES (?, ?, ?)", rows
+                )
+        except Exception as e:
+            print(f"Error writing embedding disk cache: {str(e)}")
@@ -0,0 +1,98 @@
+"""
+Request coalescing for concurrent embedding calls.
+
+Streamlit sessions share one VectorDBManager, so several users' queries
+can need embeddings at the same moment. EmbeddingBatcher funnels those
+calls through a single worker thread that merges whatever requests are
+queued into one embedder call, instead of running many size-1 batches
+side by side.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Sequence
+
+# Texts merged into one embedder call at most
+MAX_BATCH_SIZE = 32
+
+
+class EmbeddingBatcher:
+    def __init__(self, embed_fn: Callable[[List[str]], Sequence], max_batch_size: int = MAX_BATCH_SIZE,
+                 max_wait: float = 0.0):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        # Seconds to hold a batch open for more requests. At 0 nothing waits:
+        # requests arriving while a batch is embedding form the next batch.
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def embed(self, texts: List[str]) -> Sequence:
+        """
+        Embed texts, possibly together with other callers' texts; blocks for the result.
+
+        Raises:
+            ValueError: If a text is empty or whitespace; the embedder would
+                drop it and misalign every batch it was merged into
+        """
+        if not texts:
+            return []
+        if any(not isinstance(text, str) or not text.strip() for text in texts):
+            raise ValueError("Texts to embed must be non-empty strings")
+
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((texts, future))
+        return future.result()
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                try:
+                    remaining = deadline - time.monotonic()
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._flush(batch)
+
+    def _flush(self, batch):
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        try:
+            vectors = self._embed_checked(texts)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # Re-run each request alone so only the one at fault sees an error
+            for request_texts, future in batch:
+                try:
+                    future.set_result(self._embed_checked(request_texts))
+                except Exception as request_error:
+                    future.set_exception(request_error)
+            return
+
+        offset = 0
+        for request_texts, future in batch:
+            future.set_result(vectors[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+    def _embed_checked(self, texts: List[str]) -> Sequence:
+        vectors = self.embed_fn(texts)
+        if len(vectors) != len(texts):
+            raise RuntimeError(f"Expected {len(texts)} embeddings, got {len(vectors)}")
+        return vectors
@@ -14,16 +14,161 @@ The sentence-transformers fallback requires no API keys and runs locally.
 """
 
 import os
+import contextlib
+import functools
+import hashlib
+import threading
 import warnings
+from collections import OrderedDict
 from typing import List
+import numpy as np
 import streamlit as st
 from dotenv import load_dotenv
 
 # Suppress sentence-transformers warnings for cleaner output
 warnings.filterwarnings("ignore", category=UserWarning, module="sentence_transformers")
 
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
 load_dotenv()
 
+SENTENCE_MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+
+# Maximum number of texts whose embeddings EmbedderManager keeps in memory
+GENERATE_CACHE_SIZE = 2048
+# Texts per forward pass; MiniLM's short sequences fit larger batches than
+# the sentence-transformers default of 32
+ENCODE_BATCH_SIZE = 64
+# Dynamically quantized ONNX export shipped in the all-MiniLM-L6-v2 model repo
+ONNX_INT8_FILE = 'onnx/model_qint8_avx512_vnni.onnx'
+# all-MiniLM-L6-v2 vectors are unit-normalized, so every component lies in
+# [-1, 1]; a fixed symmetric scale keeps int8 codes comparable across calls
+INT8_SCALE = 127
+
+
+def _load_once(loader):
+    """
+    Memoize a zero-argument loader like functools.lru_cache(maxsize=1), but
+    thread-safe: lru_cache lets racing threads each run the loader on a
+    cold cache, which here would load the model twice. Once loaded, calls
+    take the lock-free fast path. cache_clear() still forces a reload.
+    """
+    cached = functools.lru_cache(maxsize=1)(loader)
+    lock = threading.Lock()
+    
+    @functools.wraps(loader)
+    def wrapper():
+        if cached.cache_info().currsize:
+            return cached()
+        with lock:
+            return cached()
+    
+    wrapper.cache_clear = cached.cache_clear
+    wrapper.cache_info = cached.cache_info
+    return wrapper
+
+
+@_load_once
+def load_sentence_model():
+    """
+    Load all-MiniLM-L6-v2 once per process, preferring the ONNX Runtime backend.
+    
+    Every EmbedderManager shares the returned model, so the ~90 MB of
+    weights are read and allocated only once. ONNX Runtime fuses the
+    graph and avoids PyTorch's per-op dispatch, which is noticeably
+    faster on CPU; it needs sentence-transformers >= 3.2 with
+    optimum[onnxruntime], otherwise the PyTorch backend is used.
+    
+    With EMBEDDING_INT8_MODEL=1 the model weights are INT8 as well: the
+    pre-quantized ONNX file, or dynamic quantization of the PyTorch
+    Linear layers. Vectors shift slightly, so re-index after enabling it.
+    
+    Returns:
+        Tuple of (model, backend name)
+    """
+    if SentenceTransformer is None:
+        raise ImportError("sentence-transformers is not installed")
+    
+    int8 = str(st.secrets.get("EMBEDDING_INT8_MODEL", os.getenv('EMBEDDING_INT8_MODEL', ''))).lower() in ('1', 'true', 'yes')
+    
+    if int8:
+        try:
+            model = SentenceTransformer(SENTENCE_MODEL_NAME, backend="onnx",
+                                        model_kwargs={"file_name": ONNX_INT8_FILE})
+            return model, "onnx-int8"
+        except Exception as e:
+            print(f"⚠ INT8 ONNX model unavailable ({str(e)}), trying full precision")
+    
+    try:
+        return SentenceTransformer(SENTENCE_MODEL_NAME, backend="onnx"), "onnx"
+    except Exception as e:
+        print(f"⚠ ONNX backend unavailable ({str(e)}), using PyTorch")
+    
+    model = SentenceTransformer(SENTENCE_MODEL_NAME)
+    _configure_torch_threads()
+    if int8:
+        try:
+            import torch
+            transformer = model[0].auto_model
+            model[0].auto_model = torch.ao.quantization.quantize_dynamic(
+                transformer, {torch.nn.Linear}, dtype=torch.qint8
+            )
+            return model, "torch-int8"
+        except Exception as e:
+            print(f"⚠ INT8 quantization failed ({str(e)}), using full precision")
+    
+    try:
+        import torch
+        import intel_extension_for_pytorch as ipex
+        model[0].auto_model = ipex.optimize(model[0].auto_model.eval(), dtype=torch.bfloat16)
+        return model, "torch-bf16"
+    except Exception:
+        pass  # IPEX is optional; non-Intel machines keep FP32
+    return model, "torch"
+
+
+def _configure_torch_threads():
+    """Size PyTorch's thread pools for single-model CPU inference."""
+    try:
+        import torch
+        # PyTorch sizes its pool from the host's cores, which oversubscribes
+        # containers limited to fewer CPUs
+        if hasattr(os, 'sched_getaffinity'):
+            torch.set_num_threads(min(torch.get_num_threads(), len(os.sched_getaffinity(0))))
+        # encode() runs one graph at a time, so inter-op threads only sit idle
+        torch.set_num_interop_threads(1)
+    except Exception:
+        pass  # Pools are fixed once PyTorch has started parallel work
+
+
+def contextual_text(doc: dict) -> str:
+    """
+    Text to embed for a document chunk: its document context, then the chunk.
+    
+    Prefixing the source file name (and section, when the metadata has
+    one) steers the vector toward the document the chunk came from, so
+    similar phrasing from different FAQs is told apart. Only the
+    embedding sees the prefix; the stored page_content stays raw.
+    """
+    metadata = doc.get('metadata') or {}
+    context = []
+    if metadata.get('source'):
+        context.append(f"[source={os.path.splitext(os.path.basename(metadata['source']))[0]}]")
+    if metadata.get('section'):
+        context.append(f"[section={metadata['section']}]")
+    if not context:
+        return doc['page_content']
+    return f"{' '.join(context)}\n{doc['page_content']}"
+
+
+def quantize_int8(embeddings) -> np.ndarray:
+    """Quantize unit-norm float embeddings to int8 (4x smaller than float32)."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    return np.clip(np.rint(embeddings * INT8_SCALE), -INT8_SCALE, INT8_SCALE).astype(np.int8)
+
 
 class EmbedderManager:
     """
@@ -34,10 +179,32 @@ class EmbedderManager:
     2. Sentence-transformers all-MiniLM-L6-v2 (local fallback)
     """
     
-    def __init__(self):
+    # Embedding dimension per provider; update the Groq entry once Groq
+    # embeddings are available (all-MiniLM-L6-v2 produces 384 dimensions)
+    PROVIDER_DIMENSIONS = {
+        "groq": 1536,
+        "sentence_transformers": 384
+    }
+    PROVIDER_MODELS = {
+        "groq": "Groq Embedding Model (TBD)",
+        "sentence_transformers": SENTENCE_MODEL_NAME
+    }
+    
+    def __init__(self, quantize: bool = False):
         self.provider = None
+        # Return int8 vectors from generate() instead of float lists
+        self.quantize = quantize
         self.groq_client = None
         self.sentence_model = None
+        # Inference backend of the sentence-transformers model ("onnx" or
+        # "torch", with an "-int8"/"-bf16" suffix for reduced precision)
+        self.backend = None
+        # LRU of content hash -> float32 embedding, consulted before the model;
+        # VectorDBManager adds the persistent tiers (SQLite, Redis) in front of it
+        self._cache = OrderedDict()
+        # generate() runs on the batcher thread, the embed pool and sessions
+        self._cache_lock = threading.Lock()
+        self._provider_info = None
         self._initialize_provider()
     
     def _initialize_provider(self):
@@ -66,9 +233,8 @@ class EmbedderManager:
         
         # Fallback to sentence-transformers
         try:
-            from sentence_transformers import SentenceTransformer
             print("📥 Loading sentence-transformers model (all-MiniLM-L6-v2)...")
-            self.sentence_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+            self.sentence_model = self._load_sentence_model()
             self.provider = "sentence_transformers"
             print("✓ Using sentence-transformers (local) embeddings")
             
@@ -80,6 +246,11 @@ class EmbedderManager:
         except Exception as e:
             raise RuntimeError(f"Failed to initialize any embedding provider: {str(e)}")
     
+    def _load_sentence_model(self):
+        """Get the process-wide all-MiniLM-L6-v2 model and record its backend."""
+        model, self.backend = load_sentence_model()
+        return model
+    
     def _test_groq_embeddings(self) -> bool:
         """
         Test if Groq embeddings are available.
@@ -115,21 +286,31 @@ class EmbedderManager:
             "Groq embeddings not yet implemented. Using sentence-transformers fallback."
         )
     
-    def _generate_sentence_transformer_embeddings(self, texts: List[str]) -> List[List[float]]:
+    def _generate_sentence_transformer_embeddings(self, texts: List[str]) -> np.ndarray:
         """Generate embeddings using sentence-transformers."""
         try:
-            embeddings = self.sentence_model.encode(
-                texts,
-                convert_to_numpy=True,
-                show_progress_bar=len(texts) > 10  # Only show progress for larger batches
-            )
-            # Convert numpy arrays to lists for consistency
-            return [embedding.tolist() for embedding in embeddings]
+            with self._autocast():
+                embeddings = self.sentence_model.encode(
+                    texts,
+                    batch_size=ENCODE_BATCH_SIZE,
+                    convert_to_numpy=True,
+                    # Unit norm is what quantize_int8 and the inner-product indexes assume
+                    normalize_embeddings=True,
+                    show_progress_bar=len(texts) > 10  # Only show progress for larger batches
+                )
+            return np.asarray(embeddings, dtype=np.float32)
             
         except Exception as e:
             raise RuntimeError(f"Error generating sentence-transformer embeddings: {str(e)}")
     
-    def generate(self, texts: List[str]) -> List[List[float]]:
+    def _autocast(self):
+        """BF16 autocast for an IPEX-optimized model, a no-op otherwise."""
+        if self.backend == "torch-bf16":
+            import torch
+            return torch.autocast("cpu", dtype=torch.bfloat16)
+        return contextlib.nullcontext()
+    
+    def generate(self, texts: List[str]) -> np.ndarray:
         """
         Generate embeddings for a list of texts.
         
@@ -137,7 +318,8 @@ class EmbedderManager:
             texts: List of text strings to embed
             
         Returns:
-            List of embedding vectors (each vector is a list of floats)
+            (n, dimension) float32 array with one row per non-empty text,
+            or int8 when the embedder quantizes
             
         Raises:
             ValueError: If texts is empty or contains non-string elements
@@ -154,6 +336,49 @@ class EmbedderManager:
         if not non_empty_texts:
             raise ValueError("All texts are empty after filtering")
         
+        # Serve repeated texts from the cache and embed each distinct miss once
+        keys = [self._cache_key(text) for text in non_empty_texts]
+        vectors = {}
+        misses = {}
+        with self._cache_lock:
+            for key, text in zip(keys, non_empty_texts):
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    vectors[key] = cached
+                else:
+                    misses.setdefault(key, text)
+        
+        if misses:
+            generated = self._generate_uncached(list(misses.values()))
+            for (key, text), embedding in zip(misses.items(), generated):
+                # Copy the row so the cache does not pin the whole batch array
+                vectors[key] = np.array(embedding, dtype=np.float32)
+            with self._cache_lock:
+                for key, text in misses.items():
+                    # Re-keyed in case a Groq failure just switched the provider
+                    cache_key = self._cache_key(text)
+                    self._cache[cache_key] = vectors[key]
+                    self._cache.move_to_end(cache_key)
+                    if len(self._cache) > GENERATE_CACHE_SIZE:
+                        self._cache.popitem(last=False)  # Evict least recently used
+        
+        embeddings = np.stack([vectors[key] for key in keys])
+        if self.quantize:
+            return quantize_int8(embeddings)
+        return embeddings
+    
+    def generate_as_list(self, texts: List[str]) -> List[List[float]]:
+        """generate() as nested Python lists, for callers that need plain JSON-able values."""
+        return self.generate(texts).tolist()
+    
+    def _cache_key(self, text: str) -> bytes:
+        """Content address of a text under the active provider and its dimension."""
+        tag = f"{self.provider}:{self.PROVIDER_DIMENSIONS.get(self.provider)}"
+        return hashlib.blake2b(f"{tag}\x1f{text}".encode("utf-8"), digest_size=16).digest()
+    
+    def _generate_uncached(self, non_empty_texts: List[str]):
+        """Embed texts with the active provider, falling back to sentence-transformers."""
         try:
             if self.provider == "groq":
                 return self._generate_groq_embeddings(non_empty_texts)
@@ -167,10 +392,9 @@ class EmbedderManager:
                 # If Groq fails, fall back to sentence transformers
                 print(f"⚠ Groq embedding failed: {str(e)}, falling back to sentence-transformers")
                 try:
-                    from sentence_transformers import SentenceTransformer
                     if not self.sentence_model:
                         print("📥 Loading sentence-transformers model as fallback...")
-                        self.sentence_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+                        self.sentence_model = self._load_sentence_model()
                         self.provider = "sentence_transformers"
                     
                     return self._generate_sentence_transformer_embeddings(non_empty_texts)
@@ -179,6 +403,28 @@ class EmbedderManager:
             else:
                 raise RuntimeError(f"Embedding generation failed: {str(e)}")
     
+    @staticmethod
+    def rank_against(query, matrix) -> np.ndarray:
+        """
+        Cosine similarity between one query vector and each row of a matrix.
+        
+        Args:
+            query: Embedding vector of length dimension
+            matrix: (n, dimension) array or list of candidate embeddings
+            
+        Returns:
+            float32 array of n similarity scores (0 for zero-norm rows)
+        """
+        query = np.asarray(query, dtype=np.float32).ravel()
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[1] != query.shape[0]:
+            raise ValueError("Matrix rows must match the query dimension")
+        
+        # One BLAS matrix-vector product plus row norms, no per-row Python loop
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        scores = matrix @ query
+        return np.divide(scores, norms, out=np.zeros_like(scores), where=norms > 0)
+    
     def get_embedding_dimension(self) -> int:
         """
         Get the dimension of embeddings produced by the current provider.
@@ -186,44 +432,74 @@ class EmbedderManager:
         Returns:
             Integer dimension of embedding vectors
         """
-        if self.provider == "groq":
-            # Return dimension based on Groq's embedding model
-            # This will need to be updated when Groq embeddings are available
-            return 1536  # Placeholder - update with actual Groq embedding dimensions
-        elif self.provider == "sentence_transformers":
-            # all-MiniLM-L6-v2 produces 384-dimensional embeddings
-            return 384
-        else:
+        dimension = self.PROVIDER_DIMENSIONS.get(self.provider)
+        if dimension is None:
             raise RuntimeError("No embedding provider initialized")
+        return dimension
+    
+    def get_model_signature(self) -> str:
+        """
+        Identify the model that produces the current embeddings.
+        
+        Combines the provider, the sentence-transformers backend and the
+        dimension, so vectors from an INT8 or bf16 backend, or from a
+        different provider, never pass for each other in persisted caches
+        or chunk hashes.
+        
+        Returns:
+            String such as "sentence_transformers:onnx:384"
+        """
+        return f"{self.provider}:{self.backend}:{self.PROVIDER_DIMENSIONS.get(self.provider)}"
     
     def get_provider_info(self) -> dict:
         """
         Get information about the current embedding provider.
         
+        The dictionary is built once per provider and shared between
+        calls; treat it as read-only.
+        
         Returns:
             Dictionary with provider information
         """
-        return {
-            "provider": self.provider,
-            "dimension": self.get_embedding_dimension(),
-            "model": {
-                "groq": "Groq Embedding Model (TBD)",
-                "sentence_transformers": "sentence-transformers/all-MiniLM-L6-v2"
-            }.get(self.provider, "Unknown")
-        }
+        if self._provider_info is None or self._provider_info["provider"] != self.provider:
+            self._provider_info = {
+                "provider": self.provider,
+                "dimension": self.get_embedding_dimension(),
+                "model": self.PROVIDER_MODELS.get(self.provider, "Unknown"),
+                "dtype": "int8" if self.quantize else "float32",
+                "backend": self.backend
+            }
+        return self._provider_info
 
 
-# Global embedder instance for easy importing
-_embedder_instance = None
-
+@_load_once
 def get_embedder() -> EmbedderManager:
-    """Get the global embedder instance (singleton pattern)."""
-    global _embedder_instance
-    if _embedder_instance is None:
-        _embedder_instance = EmbedderManager()
-    return _embedder_instance
+    """
+    Get the global embedder instance (singleton pattern).
+    
+    The instance is memoized process-wide so the migration utility,
+    VectorDBManager and the app all share one warm model; concurrent
+    first calls wait for a single instance to be built. Call
+    ``get_embedder.cache_clear()`` to force a fresh instance.
+    """
+    return EmbedderManager()
+
+def warm_up():
+    """
+    Load the shared embedder and run one throwaway encode.
+    
+    Meant for a background thread at startup: the first real query then
+    finds the model loaded and ONNX Runtime/PyTorch kernels initialized
+    instead of paying that cost itself. Errors are only logged, since
+    the next get_embedder() call raises them where they can be handled.
+    """
+    try:
+        embedder = get_embedder()
+        embedder._generate_uncached(["warmup"])  # Bypasses the cache
+    except Exception as e:
+        print(f"⚠ Embedder warm-up failed: {str(e)}")
 
-def generate(texts: List[str]) -> List[List[float]]:
+def generate(texts: List[str]) -> np.ndarray:
     """
     Convenience function for generating embeddings.
     
@@ -233,7 +509,7 @@ def generate(texts: List[str]) -> List[List[float]]:
         texts: List of text strings to embed
         
     Returns:
-        List of embedding vectors (each vector is a list of floats)
+        (n, dimension) float32 array of embedding vectors
     """
     embedder = get_embedder()
     return embedder.generate(texts)
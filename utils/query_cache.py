@@ -0,0 +1,68 @@
+"""
+Bounded LRU + TTL cache of vector search results.
+
+Results are keyed by collection, top_k and a hash of the query vector
+rounded to 4 decimals, so repeated queries skip the Pinecone round trip.
+Entries for a collection are dropped whenever that collection changes.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Default bounds for cached search results
+QUERY_CACHE_SIZE = 1000
+QUERY_CACHE_TTL = 300
+
+
+class QueryCache:
+    def __init__(self, max_entries: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (timestamp, results)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(collection: str, vector, top_k: int) -> tuple:
+        """Cache key; rounding lets float noise from re-embedding still hit."""
+        rounded = np.round(np.asarray(vector, dtype=np.float32), 4)
+        digest = hashlib.blake2b(rounded.tobytes(), digest_size=16).digest()
+        return collection, top_k, digest
+
+    def get(self, key: tuple) -> Optional[List[Dict[str, Any]]]:
+        """Return a copy of the cached results, or None on a miss or expiry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            timestamp, results = entry
+            if time.time() - timestamp > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return list(results)
+
+    def put(self, key: tuple, results: List[Dict[str, Any]]):
+        """Store results, evicting the least recently used entry when full."""
+        with self._lock:
+            self._entries[key] = (time.time(), list(results))
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, collection: str):
+        """Drop every cached result for a collection."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == collection]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
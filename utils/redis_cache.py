@@ -0,0 +1,111 @@
+"""
+Shared Redis cache (L2) behind the in-process caches.
+
+Lets Streamlit replicas and restarted processes reuse embeddings and
+generated answers. Redis is optional: when the `redis` package is not
+installed or REDIS_URL is not configured, every lookup misses and every
+store is a no-op, so callers keep working on their L1 cache alone.
+
+Values are stored as JSON, and embeddings as raw float32 bytes. Nothing
+read back is unpickled, so a client able to write to the shared Redis
+cannot run code in the replicas reading from it.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+import streamlit as st
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
+
+load_dotenv()
+
+# Default lifetimes for cached entries, in seconds
+EMBEDDING_TTL = 86400
+RESPONSE_TTL = 900
+
+
+class RedisCache:
+    def __init__(self, url: Optional[str] = None, prefix: str = "faq"):
+        self.prefix = prefix
+        self.client = None
+
+        url = url or st.secrets.get("REDIS_URL", os.getenv('REDIS_URL'))
+        if not url:
+            return
+
+        try:
+            import redis
+            self.client = redis.Redis.from_url(url)
+        except Exception as e:
+            print(f"Redis cache disabled: {str(e)}")
+            self.client = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.client is not None
+
+    def key(self, kind: str, *parts: Any) -> str:
+        """Build a namespaced key from a SHA-1 of the given parts."""
+        digest = hashlib.sha1("\x1f".join(map(str, parts)).encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{kind}:{digest}"
+
+    @staticmethod
+    def _dumps(value: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(value)
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+    @staticmethod
+    def _loads(payload: bytes) -> Any:
+        return orjson.loads(payload) if orjson is not None else json.loads(payload)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached JSON value, or None on a miss or any Redis error."""
+        if self.client is None:
+            return None
+        try:
+            payload = self.client.get(key)
+            return self._loads(payload) if payload is not None else None
+        except Exception as e:
+            print(f"Error reading from Redis: {str(e)}")
+            return None
+
+    def set(self, key: str, value: Any, ttl: int):
+        """Store a JSON-serializable value with an expiry; failures are logged and ignored."""
+        if self.client is None:
+            return
+        try:
+            self.client.setex(key, ttl, self._dumps(value))
+        except Exception as e:
+            print(f"Error writing to Redis: {str(e)}")
+
+    def get_vectors(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """Fetch several float32 vectors in one round trip; misses and errors are None."""
+        if self.client is None or not keys:
+            return [None] * len(keys)
+        try:
+            payloads = self.client.mget(keys)
+            return [np.frombuffer(p, dtype=np.float32) if p is not None else None for p in payloads]
+        except Exception as e:
+            print(f"Error reading from Redis: {str(e)}")
+            return [None] * len(keys)
+
+    def set_vectors(self, items: Dict[str, np.ndarray], ttl: int):
+        """Store several vectors as float32 bytes with one pipelined round trip."""
+        if self.client is None or not items:
+            return
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key, vector in items.items():
+                pipe.setex(key, ttl, np.asarray(vector, dtype=np.float32).tobytes())
+            pipe.execute()
+        except Exception as e:
+            print(f"Error writing to Redis: {str(e)}")
@@ -4,11 +4,92 @@ UI Helper Functions
 This module contains utility functions for UI operations and state management.
 """
 
+import re
+import functools
+import platform
 import streamlit as st
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 import time
 from datetime import datetime
 
+PATENT_SUGGESTIONS = (
+    "What is the patent application process?",
+    "How long does patent protection last?",
+    "What are the costs involved in patent filing?",
+    "What are the requirements for patentability?",
+    "How do I check if my invention is patentable?",
+    "What is the difference between a patent and a trademark?",
+    "Can I file a patent internationally?",
+    "What happens after I file a patent application?"
+)
+
+BIS_SUGGESTIONS = (
+    "What is the BIS certification process?",
+    "How long does BIS certification take?",
+    "What are the costs of BIS certification?",
+    "Which products need BIS certification?",
+    "How do I apply for BIS certification?",
+    "What are BIS quality standards?",
+    "How to renew BIS certification?",
+    "What documents are required for BIS certification?"
+)
+
+# Keywords match at word starts ("patents" counts), but "ip" and "bis"
+# only as whole words so "ship" or "rabbis" do not
+PATENT_KEYWORDS = re.compile(r'\b(?:patent|invention|ip\b)', re.IGNORECASE)
+BIS_KEYWORDS = re.compile(r'\b(?:bis\b|certification|standard)', re.IGNORECASE)
+
+# Mixed suggestions shown for the "all" category, built once
+_PATENT_LEANING = PATENT_SUGGESTIONS[:4] + BIS_SUGGESTIONS[:2]
+_BIS_LEANING = BIS_SUGGESTIONS[:4] + PATENT_SUGGESTIONS[:2]
+_BALANCED = PATENT_SUGGESTIONS[:3] + BIS_SUGGESTIONS[:3]
+
+# (seconds per unit, unit name) for relative timestamps, largest first
+_ELAPSED_UNITS = ((86400, 'days'), (3600, 'hours'), (60, 'minutes'))
+
+# Seconds a reading of available memory is reused across reruns
+MEMORY_INFO_TTL = 5.0
+# (time.monotonic() of the reading, formatted value)
+_memory_available = (float('-inf'), 'Unknown')
+
+
+@functools.lru_cache(maxsize=1)
+def _static_system_info() -> Dict[str, Any]:
+    """System fields that cannot change while the process runs."""
+    import psutil
+    
+    try:
+        return {
+            'platform': platform.system(),
+            'python_version': platform.python_version(),
+            'cpu_count': psutil.cpu_count(),
+            'memory_total': f"{psutil.virtual_memory().total // (1024**3)} GB"
+        }
+    except Exception:
+        return {
+            'platform': 'Unknown',
+            'python_version': platform.python_version(),
+            'cpu_count': 'Unknown',
+            'memory_total': 'Unknown'
+        }
+
+
+def _available_memory() -> str:
+    """Available memory, re-read from the OS at most every MEMORY_INFO_TTL seconds."""
+    global _memory_available
+    import psutil
+    
+    read_at, value = _memory_available
+    now = time.monotonic()
+    if now - read_at >= MEMORY_INFO_TTL:
+        try:
+            value = f"{psutil.virtual_memory().available // (1024**3)} GB"
+        except Exception:
+            value = 'Unknown'
+        _memory_available = (now, value)
+    return value
+
+
 class UIHelpers:
     """Collection of UI helper functions."""
     
@@ -68,83 +149,67 @@ class UIHelpers:
         return (successful / total) * 100
     
     @staticmethod
-    def format_timestamp(timestamp: datetime) -> str:
-        """Format timestamp for display."""
+    def format_timestamp(timestamp: datetime, now: Optional[datetime] = None) -> str:
+        """
+        Format timestamp for display.
+        
+        Pass `now` when formatting many timestamps in one render so they
+        share a single clock reading.
+        """
         if not timestamp:
             return "Never"
         
-        now = datetime.now()
-        diff = now - timestamp
-        
-        if diff.days > 0:
-            return f"{diff.days} days ago"
-        elif diff.seconds > 3600:
-            hours = diff.seconds // 3600
-            return f"{hours} hours ago"
-        elif diff.seconds > 60:
-            minutes = diff.seconds // 60
-            return f"{minutes} minutes ago"
-        else:
-            return "Just now"
+        seconds = ((now or datetime.now()) - timestamp).total_seconds()
+        for threshold, unit in _ELAPSED_UNITS:
+            if seconds >= threshold:
+                return f"{int(seconds // threshold)} {unit} ago"
+        return "Just now"
     
     @staticmethod
     def show_toast(message: str, type: str = "info", duration: int = 3):
-        """Show a toast notification."""
-        toast_colors = {
-            'success': '#10b981',
-            'error': '#ef4444',
-            'warning': '#f59e0b',
-            'info': '#3b82f6'
-        }
-        
-        color = toast_colors.get(type, toast_colors['info'])
+        """
+        Show a toast notification.
         
-        toast_placeholder = st.empty()
-        toast_placeholder.markdown(f"""
-            <div style="
-                position: fixed;
-                top: 20px;
-                right: 20px;
-                background: {color};
-                color: white;
-                padding: 1rem 1.5rem;
-                border-radius: 0.5rem;
-                box-shadow: 0 4px 12px rgba(0, 0, 0, 0.15);
-                z-index: 1000;
-                animation: slideInRight 0.3s ease-out;
-            ">
-                {message}
-            </div>
-            <style>
-            @keyframes slideInRight {{
-                from {{ transform: translateX(100%); opacity: 0; }}
-                to {{ transform: translateX(0); opacity: 1; }}
-            }}
-            </style>
-        """, unsafe_allow_html=True)
+        Uses Streamlit's built-in toast, which the browser dismisses on its
+        own, so the script run is not held up while it is visible.
+        `duration` is kept for compatibility; Streamlit sets the timing.
+        """
+        toast_icons = {
+            'success': '✅',
+            'error': '❌',
+            'warning': '⚠️',
+            'info': 'ℹ️'
+        }
         
-        time.sleep(duration)
-        toast_placeholder.empty()
+        st.toast(message, icon=toast_icons.get(type, toast_icons['info']))
     
     @staticmethod
-    def create_download_link(data: str, filename: str, text: str) -> str:
-        """Create a download link for data."""
+    def create_download_link(data: Union[str, bytes], filename: str, text: str) -> str:
+        """
+        Create a download link for data.
+        
+        Bytes are encoded as-is; text is UTF-8 encoded once. For large
+        payloads prefer st.download_button, which skips the base64 data URI.
+        """
         import base64
         
-        b64 = base64.b64encode(data.encode()).decode()
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        b64 = base64.b64encode(data).decode('ascii')
         href = f'<a href="data:text/plain;base64,{b64}" download="{filename}">{text}</a>'
         return href
     
     @staticmethod
     def validate_input(text: str, min_length: int = 1, max_length: int = 1000) -> tuple[bool, str]:
         """Validate user input."""
-        if not text or not text.strip():
+        length = len(text.strip()) if text else 0
+        if not length:
             return False, "Please enter a question."
         
-        if len(text.strip()) < min_length:
+        if length < min_length:
             return False, f"Question must be at least {min_length} characters long."
         
-        if len(text.strip()) > max_length:
+        if length > max_length:
             return False, f"Question must be less than {max_length} characters long."
         
         return True, ""
@@ -152,85 +217,46 @@ class UIHelpers:
     @staticmethod
     def get_question_suggestions(query: str, category: str = "all") -> List[str]:
         """Get question suggestions based on input."""
-        patent_suggestions = [
-            "What is the patent application process?",
-            "How long does patent protection last?",
-            "What are the costs involved in patent filing?",
-            "What are the requirements for patentability?",
-            "How do I check if my invention is patentable?",
-            "What is the difference between a patent and a trademark?",
-            "Can I file a patent internationally?",
-            "What happens after I file a patent application?"
-        ]
-        
-        bis_suggestions = [
-            "What is the BIS certification process?",
-            "How long does BIS certification take?",
-            "What are the costs of BIS certification?",
-            "Which products need BIS certification?",
-            "How do I apply for BIS certification?",
-            "What are BIS quality standards?",
-            "How to renew BIS certification?",
-            "What documents are required for BIS certification?"
-        ]
-        
         if category == "patent":
-            return patent_suggestions
+            return list(PATENT_SUGGESTIONS)
         elif category == "bis":
-            return bis_suggestions
+            return list(BIS_SUGGESTIONS)
         else:
             # Return mixed suggestions based on query content
-            query_lower = query.lower()
-            if any(keyword in query_lower for keyword in ['patent', 'invention', 'ip']):
-                return patent_suggestions[:4] + bis_suggestions[:2]
-            elif any(keyword in query_lower for keyword in ['bis', 'certification', 'standard']):
-                return bis_suggestions[:4] + patent_suggestions[:2]
+            if PATENT_KEYWORDS.search(query):
+                return list(_PATENT_LEANING)
+            elif BIS_KEYWORDS.search(query):
+                return list(_BIS_LEANING)
             else:
-                return patent_suggestions[:3] + bis_suggestions[:3]
+                return list(_BALANCED)
     
     @staticmethod
     def export_chat_history(chat_history: List[Dict[str, Any]]) -> str:
         """Export chat history as formatted text."""
-        export_text = "# Chat History Export\n\n"
-        export_text += f"Exported on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+        # Collect parts and join once; repeated += re-copies the whole export
+        parts = [
+            "# Chat History Export\n\n",
+            f"Exported on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+        ]
         
-        for i, message in enumerate(chat_history):
+        for message in chat_history:
             role = "You" if message['role'] == 'user' else "Assistant"
             timestamp = message.get('timestamp', '')
-            content = message['content']
-            
-            export_text += f"## {role} ({timestamp})\n"
-            export_text += f"{content}\n\n"
+            parts.append(f"## {role} ({timestamp})\n{message['content']}\n\n")
             
             if message.get('source'):
-                export_text += f"*Source: {message['source']}*\n\n"
+                parts.append(f"*Source: {message['source']}*\n\n")
             
-            export_text += "---\n\n"
+            parts.append("---\n\n")
         
-        return export_text
+        return "".join(parts)
     
     @staticmethod
     def get_system_info() -> Dict[str, Any]:
         """Get system information for display."""
-        import platform
-        import psutil
-        
-        try:
-            return {
-                'platform': platform.system(),
-                'python_version': platform.python_version(),
-                'cpu_count': psutil.cpu_count(),
-                'memory_total': f"{psutil.virtual_memory().total // (1024**3)} GB",
-                'memory_available': f"{psutil.virtual_memory().available // (1024**3)} GB"
-            }
-        except:
-            return {
-                'platform': 'Unknown',
-                'python_version': platform.python_version(),
-                'cpu_count': 'Unknown',
-                'memory_total': 'Unknown',
-                'memory_available': 'Unknown'
-            }
+        info = dict(_static_system_info())
+        info['memory_available'] = _available_memory()
+        return info
     
     @staticmethod
     def create_feedback_form():